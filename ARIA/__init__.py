@@ -1,26 +1,55 @@
 # __init__.py
 
+from importlib import import_module
+
 from ._version_ import __version__
 
-# Import and optionally re-export relevant functions from each module.
-
-from .project_setup import setup_brightway_project
-from .data_handling import open_excel_with_applescript, read_and_clean_excel
-from .search_utils import build_search_query, get_alternative_search_terms
-from .search_workflow import process_dataframe
-from .ecoinvent_processing import process_ecoinvent_dataframe
-from .impact_assessment import run_impact_assessment
-from .plot_lcia import plot_lcia_waterfall_charts
-
-__all__ = [
-    "setup_brightway_project",
-    "open_excel_with_applescript",
-    "read_and_clean_excel",
-    "build_search_query",
-    "get_alternative_search_terms",
-    "process_dataframe",
-    "process_ecoinvent_dataframe",
-    "run_impact_assessment",
-    "plot_lcia_waterfall_charts",
-    "__version__",
-]
+# Relevant functions from each module are re-exported here. Submodules are
+# imported on first access (PEP 562), so 'import ARIA' does not load
+# brightway2, openai or the plotting libraries, nor read any credentials.
+
+_EXPORTS = {
+    "setup_brightway_project": ".project_setup",
+    "open_excel_with_applescript": ".data_handling",
+    "read_and_clean_excel": ".data_handling",
+    "build_search_query": ".search_utils",
+    "get_alternative_search_terms": ".search_utils",
+    "search_locations": ".search_utils",
+    "rank_candidates": ".search_utils",
+    "MemoizedSearch": ".search_utils",
+    "process_dataframe": ".search_workflow",
+    "iter_process_dataframe": ".search_workflow",
+    "process_ecoinvent_dataframe": ".ecoinvent_processing",
+    "parse_ecoinvent_process": ".ecoinvent_processing",
+    "run_impact_assessment": ".impact_assessment",
+    "iter_impact_assessment": ".impact_assessment",
+    "register_impact_category": ".impact_assessment",
+    "ActivityIndex": ".activity_index",
+    "get_activity_index": ".activity_index",
+    "LCAEngine": ".lca_engine",
+    "UnitImpactCache": ".impact_cache",
+    "plot_lcia_waterfall_charts": ".plot_lcia",
+    "CompletionCache": ".completion_cache",
+    "CachedClient": ".completion_cache",
+    "ActivityRetrievalIndex": ".retrieval_index",
+    "CheckpointJournal": ".checkpoint",
+    "run_portfolio": ".portfolio",
+    "MetricsCollector": ".instrumentation",
+    "RateLimitedClient": ".openai_client",
+    "MatchCoalescer": ".coalescing",
+    "MatchMemory": ".match_memory",
+}
+
+__all__ = [*_EXPORTS, "__version__"]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_EXPORTS])
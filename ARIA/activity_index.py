@@ -0,0 +1,128 @@
+# activity_index.py
+
+import json
+import os
+import brightway2 as bw
+
+# In-memory indexes, keyed by (project, database name).
+_INDEX_CACHE = {}
+
+
+def database_version(ecoinvent_db_name: str) -> str:
+    """
+    Returns the 'modified' timestamp Brightway2 records for a database.
+    It changes whenever the database is written to, so it is used to tell
+    whether a stored index (or any other derived data) is still valid.
+    """
+    metadata = bw.databases[ecoinvent_db_name]
+    return str(metadata.get("modified", ""))
+
+
+class ActivityIndex:
+    """
+    Maps (name, location) and (name, location, unit) to Brightway2 activity keys.
+
+    Parameters
+    ----------
+    database : str
+        Name of the indexed database.
+    version : str
+        The database version (see ``database_version``) the index was built from.
+    entries : list of tuple
+        (name, location, unit, key) tuples, one per activity.
+    """
+
+    def __init__(self, database: str, version: str, entries: list):
+        self.database = database
+        self.version = version
+        self.entries = entries
+        self._lookup = {}
+        for name, location, unit, key in entries:
+            self._lookup.setdefault((name, location), []).append(key)
+            self._lookup.setdefault((name, location, unit), []).append(key)
+
+    @classmethod
+    def build(cls, ecoinvent_db_name: str) -> "ActivityIndex":
+        """Builds the index with a single pass over the database."""
+        entries = [
+            (act["name"], act["location"], act.get("unit", ""), tuple(act.key))
+            for act in bw.Database(ecoinvent_db_name)
+        ]
+        return cls(ecoinvent_db_name, database_version(ecoinvent_db_name), entries)
+
+    def lookup(self, name: str, location: str, unit: str = None) -> list:
+        """
+        Returns the keys of the activities with this name and location.
+        If a unit is given and any activity matches it as well, only those
+        are returned.
+        """
+        if unit:
+            keys = self._lookup.get((name, location, unit))
+            if keys:
+                return list(keys)
+        return list(self._lookup.get((name, location), []))
+
+    def save(self, path: str) -> None:
+        """Writes the index to a JSON file."""
+        payload = {
+            "database": self.database,
+            "version": self.version,
+            "entries": [[name, location, unit, list(key)] for name, location, unit, key in self.entries],
+        }
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle)
+
+    @classmethod
+    def load(cls, path: str) -> "ActivityIndex":
+        """Reads an index written by ``save``."""
+        with open(path, "r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+        entries = [
+            (name, location, unit, tuple(key)) for name, location, unit, key in payload["entries"]
+        ]
+        return cls(payload["database"], payload["version"], entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def get_activity_index(ecoinvent_db_name: str, index_path: str = None) -> ActivityIndex:
+    """
+    Returns the activity index of a database, building it only when needed.
+
+    The index is kept in memory for the rest of the session and, if
+    ``index_path`` is given, stored on disk so later sessions can reuse it.
+    Both copies are rebuilt as soon as the database has been modified.
+
+    Parameters
+    ----------
+    ecoinvent_db_name : str
+        The name of the Brightway2 database to index.
+    index_path : str, optional
+        Path of a JSON file used to persist the index between sessions.
+
+    Returns
+    -------
+    ActivityIndex
+        An index that is up to date with the database.
+    """
+    version = database_version(ecoinvent_db_name)
+    cache_key = (bw.projects.current, ecoinvent_db_name)
+
+    index = _INDEX_CACHE.get(cache_key)
+    if index is not None and index.version == version:
+        return index
+
+    index = None
+    if index_path and os.path.exists(index_path):
+        stored = ActivityIndex.load(index_path)
+        if stored.database == ecoinvent_db_name and stored.version == version:
+            index = stored
+
+    if index is None:
+        index = ActivityIndex.build(ecoinvent_db_name)
+        if index_path:
+            index.save(index_path)
+
+    _INDEX_CACHE[cache_key] = index
+    return index
@@ -0,0 +1,94 @@
+# checkpoint.py
+
+import json
+import os
+import threading
+
+
+def row_identity(record: dict) -> str:
+    """
+    Identifies an inventory row by its index label, activity name and notes,
+    so a journal written for one inventory is not replayed onto another. The
+    parameters of the run are checked once, by the journal's header.
+    """
+    return json.dumps([str(record["index"]), record["activity"], record.get("notes", "")])
+
+
+class CheckpointJournal:
+    """
+    Append-only JSONL journal of completed match records.
+
+    Each record is written and flushed to disk as soon as its row is resolved,
+    so an interrupted run loses at most the rows that were in flight. A torn
+    last line (e.g. after a crash mid-write) is cut off before the journal is
+    read or appended to, so the next record starts on a line of its own.
+
+    A journal started with ``run`` parameters records them in a header line.
+    Loading it with different parameters raises a ValueError instead of
+    replaying selections made, e.g., for other locations or another database.
+
+    Parameters
+    ----------
+    path : str
+        Path of the journal file. It is created if it does not exist.
+    run : dict, optional
+        JSON-serializable parameters that the journaled records depend on.
+    """
+
+    def __init__(self, path: str, run: dict = None):
+        self.path = str(path)
+        self.run = None if run is None else json.loads(json.dumps(run, default=str))
+        self._lock = threading.Lock()
+        self._repaired = False
+
+    def _repair(self) -> None:
+        """Truncates the file after its last complete line."""
+        self._repaired = True
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as handle:
+            data = handle.read()
+            if data and not data.endswith(b"\n"):
+                handle.truncate(data.rfind(b"\n") + 1)
+
+    def load(self) -> dict:
+        """Returns the journaled records, keyed by ``row_identity``."""
+        records = {}
+        with self._lock:
+            self._repair()
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "r", encoding="utf-8") as handle:
+            for number, line in enumerate(handle):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if number == 0 and self.run is not None and record.get("run") != self.run:
+                    raise ValueError(
+                        f"The checkpoint journal {self.path} was written by a run with other parameters "
+                        f"({record.get('run')} instead of {self.run}); pass resume=False to start it afresh."
+                    )
+                if "run" in record:
+                    continue
+                records[row_identity(record)] = record
+        return records
+
+    def append(self, record: dict) -> None:
+        """Writes one record and forces it to disk."""
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if not self._repaired:
+                self._repair()
+            with open(self.path, "a", encoding="utf-8") as handle:
+                if self.run is not None and handle.tell() == 0:
+                    handle.write(json.dumps({"run": self.run}) + "\n")
+                handle.write(line)
+                handle.flush()
+                os.fsync(handle.fileno())
+
+    def clear(self) -> None:
+        """Removes the journal file."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,82 @@
+# coalescing.py
+
+import threading
+from concurrent.futures import Future
+
+
+def match_key(activity: str, notes: str, user_message: str, locations) -> tuple:
+    """
+    Identifies the work of matching one activity: the activity name (case and
+    whitespace normalized), its notes, the user message and the locations.
+    Rows with the same key always get the same match.
+    """
+    return (
+        " ".join(str(activity).lower().split()),
+        " ".join(str(notes or "").split()),
+        user_message or "",
+        tuple(locations or ()),
+    )
+
+
+class MatchCoalescer:
+    """
+    Shares the match of each ``match_key`` between all rows that need it.
+
+    The first row to ask for a key runs the search -> refine -> alternatives
+    -> select chain; rows asking for the same key while it runs wait for its
+    result instead of starting their own, and later rows get the stored
+    result at once. A failed match is not stored, so it is retried by the
+    next row that needs it. One instance can be shared across runs, e.g.
+    across the products of a portfolio.
+    """
+
+    def __init__(self):
+        self.executions = 0
+        self.shared = 0
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: tuple, func):
+        """
+        Returns the result of ``func()`` for ``key``, calling it only if no
+        other row has computed (or is computing) it.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+                self.executions += 1
+            else:
+                self.shared += 1
+        if owner:
+            try:
+                future.set_result(func())
+            except BaseException as error:
+                with self._lock:
+                    del self._futures[key]
+                future.set_exception(error)
+        return future.result()
+
+    def get(self, key: tuple):
+        """Returns the stored result for ``key``, or None if it is not complete."""
+        with self._lock:
+            future = self._futures.get(key)
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        with self._lock:
+            self.shared += 1
+        return future.result()
+
+    def put(self, key: tuple, result) -> None:
+        """Stores a result computed elsewhere (e.g. by a batched selection)."""
+        future = Future()
+        future.set_result(result)
+        with self._lock:
+            self._futures[key] = future
+            self.executions += 1
+
+    def stats(self) -> dict:
+        """Returns the number of pipeline executions and of rows that shared one."""
+        with self._lock:
+            return {"executions": self.executions, "shared": self.shared, "keys": len(self._futures)}
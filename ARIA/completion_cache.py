@@ -0,0 +1,190 @@
+# completion_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+# Request options that change how a call is sent, not what the model answers.
+_TRANSPORT_PARAMS = {"timeout", "extra_headers", "extra_query", "extra_body"}
+
+
+def make_cache_key(**params) -> str:
+    """
+    Builds a stable cache key for a chat completion request.
+
+    The key is a SHA-256 digest of the model, the messages and every sampling
+    parameter (temperature, max_tokens, presence_penalty, ...), so two calls
+    only share an entry when the model would have been asked the same thing.
+
+    Parameters
+    ----------
+    **params
+        The keyword arguments passed to ``client.chat.completions.create``.
+
+    Returns
+    -------
+    str
+        A hexadecimal digest identifying the request.
+    """
+    relevant = {k: v for k, v in params.items() if k not in _TRANSPORT_PARAMS}
+    payload = json.dumps(relevant, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def completion_from_text(content: str):
+    """
+    Wraps a stored completion text in an object shaped like an OpenAI response,
+    i.e. exposing ``response.choices[0].message.content``.
+    """
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class CompletionCache:
+    """
+    Persistent store of chat completion texts, backed by SQLite.
+
+    Entries can be evicted by age (``max_age`` seconds since they were stored)
+    and by size (``max_entries``, least recently used first). Hits and misses
+    are counted so the effect of the cache on a run can be checked.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path of the SQLite file. Defaults to ':memory:', which keeps the cache
+        for the lifetime of the object only.
+    max_entries : int, optional
+        Maximum number of stored completions. Unlimited if None.
+    max_age : float, optional
+        Maximum age of an entry in seconds. Entries never expire if None.
+    """
+
+    def __init__(self, path: str = ":memory:", max_entries: int = None, max_age: float = None):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY,"
+            " content TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        """
+        Returns the stored completion text for ``key``, or None on a miss.
+        Expired entries count as misses and are removed.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.max_age is not None and now - row[1] > self.max_age:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, content: str) -> None:
+        """
+        Stores a completion text under ``key`` and applies the eviction policy.
+        A None content (e.g. a refused or tool-call completion) is not stored.
+        """
+        if content is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, content, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        if self.max_age is not None:
+            self._conn.execute("DELETE FROM completions WHERE created < ?", (now - self.max_age,))
+        if self.max_entries is not None:
+            self._conn.execute(
+                "DELETE FROM completions WHERE key NOT IN ("
+                " SELECT key FROM completions ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        """Removes every entry and resets the hit/miss counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters and the number of stored entries."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class CachedClient:
+    """
+    Wraps an OpenAI-like client so that ``client.chat.completions.create``
+    is answered from a completion cache whenever possible.
+
+    Any object with ``get(key)`` and ``set(key, content)`` methods can be
+    used as the cache, so other backends can be plugged in.
+
+    Parameters
+    ----------
+    client : Any
+        The OpenAI client (or module) performing the actual requests.
+    cache : CompletionCache
+        The cache to read from and write to.
+    """
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        key = make_cache_key(**kwargs)
+        content = self.cache.get(key)
+        if content is not None:
+            return completion_from_text(content)
+        response = self.client.chat.completions.create(**kwargs)
+        # A completion without text (e.g. a refusal) is not cached, so it is asked again
+        if response.choices[0].message.content is not None:
+            self.cache.set(key, response.choices[0].message.content)
+        return response
+
+
+def with_cache(client, cache=None):
+    """
+    Returns ``client`` wrapped in a ``CachedClient`` when a cache is given,
+    or the client unchanged otherwise.
+    """
+    if cache is None or (isinstance(client, CachedClient) and client.cache is cache):
+        return client
+    return CachedClient(client, cache)
@@ -46,3 +46,25 @@ def process_ecoinvent_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     df.drop(columns=["Process_location"], inplace=True)
 
     return df
+
+
+def parse_ecoinvent_process(text: str) -> tuple:
+    """
+    Splits a single recommended dataset, e.g. "- market for steel, GLO, kg",
+    into its process, location and unit, with the same cleaning rules as
+    ``process_ecoinvent_dataframe``.
+
+    Args:
+        text (str): The recommended dataset as returned by the search workflow.
+
+    Returns:
+        tuple: (process, location, unit); missing parts are None.
+    """
+    text = re.sub(r"[^\w\s,/%\-.]", '', str(text)).strip().lstrip("- ").strip()
+    process_location, _, unit = text.rpartition(",")
+    if not process_location:
+        return text or None, None, None
+    process, _, location = process_location.strip().lstrip("- ").strip().rpartition(",")
+    if not process:
+        return location.strip(), None, unit.strip()
+    return process.strip(), location.strip(), unit.strip()
@@ -1,10 +1,103 @@
+import numpy as np
 import brightway2 as bw
 import pandas as pd
+from .activity_index import get_activity_index, database_version
+from .lca_engine import LCAEngine
+from .impact_cache import method_version
+from .ecoinvent_processing import parse_ecoinvent_process
+from .instrumentation import span
+
+# Impact category columns, each with a test recognising the LCIA methods that fill it.
+# The first matching category wins, so more specific tests should come first.
+IMPACT_CATEGORIES = {
+    "GWP": lambda method: "global warming potential (GWP100)" in method[2],
+    "ADP": lambda method: "abiotic depletion potential (ADP)" in method[2],
+    "Water use": lambda method: "user deprivation potential" in method[2],
+    "AP": lambda method: "accumulated exceedance (AE)" in method[2],
+    "FETP": lambda method: "comparative toxic unit for ecosystems (CTUe)" in method[2],
+    "HTP": lambda method: "comparative toxic unit for human (CTUh)" in method[2],  # Carcinogenic human toxicity potential
+    "ODP": lambda method: "ozone depletion potential (ODP)" in method[2],
+    "PMFP": lambda method: "impact on human health" in method[2] and "particulate matter" in method[1],
+    "POFP": lambda method: "tropospheric ozone concentration increase" in method[2],
+}
+
+
+def register_impact_category(column: str, matcher) -> None:
+    """
+    Adds (or replaces) an impact category column.
+
+    Parameters
+    ----------
+    column : str
+        Name of the DataFrame column to fill.
+    matcher : callable
+        Takes an LCIA method tuple and returns True if the method's scores
+        belong in this column.
+    """
+    IMPACT_CATEGORIES[column] = matcher
+
+
+def impact_column(method: tuple) -> str:
+    """
+    Returns the column an LCIA method's scores are written to. Methods that no
+    registered category recognises get a column named after the method itself.
+    """
+    for column, matcher in IMPACT_CATEGORIES.items():
+        try:
+            if matcher(method):
+                return column
+        except IndexError:
+            continue
+    return " - ".join(method[1:]) if len(method) > 1 else str(method[0])
+
+
+def _activity_key(value, ecoinvent_db_name: str):
+    """
+    Returns an activity key chosen during matching as a tuple, or None if
+    there is none or it belongs to another database.
+    """
+    if isinstance(value, (tuple, list)) and len(value) == 2 and value[0] == ecoinvent_db_name:
+        return tuple(value)
+    return None
+
+
+def _unit_scores(keys, lcia_methods, ecoinvent_db_name, impact_cache=None, processes=None, engine=None, metrics=None):
+    """
+    Returns {activity key: per-unit scores} for the given keys, reading the
+    impact cache first and solving the rest with an LCAEngine. The engine is
+    reused if it already covers the missing keys, and returned for later calls.
+    """
+    unit_scores = {}
+    if impact_cache is not None and keys:
+        db_version = database_version(ecoinvent_db_name)
+        method_versions = [method_version(method) for method in lcia_methods]
+        for key in keys:
+            cached = impact_cache.get(ecoinvent_db_name, db_version, key, lcia_methods, method_versions)
+            if cached is not None:
+                unit_scores[key] = cached
+
+    missing_keys = [key for key in keys if key not in unit_scores]
+    if missing_keys:
+        if engine is None or any(key not in engine.lca.product_dict for key in missing_keys):
+            with span(metrics, "lci", activities=len(missing_keys)):
+                engine = LCAEngine(missing_keys, lcia_methods)
+        with span(metrics, "lca_solve", activities=len(missing_keys)):
+            score_matrix = engine.unit_score_matrix(missing_keys, processes=processes)
+        for key, scores in zip(missing_keys, score_matrix):
+            unit_scores[key] = scores
+            if impact_cache is not None:
+                impact_cache.set(ecoinvent_db_name, db_version, key, lcia_methods, method_versions, scores)
+    return unit_scores, engine
+
 
 def run_impact_assessment(
     processed_df: pd.DataFrame,
     lcia_methods: list,
-    ecoinvent_db_name: str = "ecoinvent-3.10.1-cutoff"
+    ecoinvent_db_name: str = "ecoinvent-3.10.1-cutoff",
+    index_path: str = None,
+    impact_cache=None,
+    processes: int = None,
+    metrics=None
 ) -> pd.DataFrame:
     """
     Runs an LCIA impact assessment on each row of the given DataFrame,
@@ -14,10 +107,25 @@ def run_impact_assessment(
     ----------
     processed_df : pd.DataFrame
         A DataFrame that must contain 'Process', 'Location', and 'In/out' columns.
+        Rows with an 'Activity key' (as set by ``process_dataframe``) in this
+        database are assessed with that activity without a name lookup.
     lcia_methods : list
         A list of LCIA method tuples of the form (method_package, method_name, method_indicator).
     ecoinvent_db_name : str, optional
         The name of the ecoinvent database to use, by default 'ecoinvent-3.10.1-cutoff'.
+    index_path : str, optional
+        Path of a JSON file in which the (name, location, unit) activity index is
+        persisted between sessions. The index is rebuilt when the database changes.
+    impact_cache : UnitImpactCache, optional
+        If provided, per-unit scores of known activities are read from this cache,
+        and newly calculated scores are added to it. An inventory made only of
+        cached activities then needs no LCA solve.
+    processes : int, optional
+        Number of worker processes used to solve the activities. The workers
+        read the LCA matrices from shared memory. Defaults to a serial solve.
+    metrics : MetricsCollector, optional
+        If provided, the activity lookup, the LCA matrix construction ('lci')
+        and the solves ('lca_solve') are timed.
 
     Returns
     -------
@@ -33,81 +141,138 @@ def run_impact_assessment(
     processed_df["In/out"] = pd.to_numeric(processed_df["In/out"], errors="coerce")
     processed_df["In/out"] = processed_df["In/out"].fillna(0)
 
-    # 3) Create columns for each impact category you might track.
-    impact_cols = {
-        "GWP": None,
-        "ADP": None,
-        "Water use": None,
-        "AP": None,
-        "FETP": None,
-        "HTP": None,   # Carcinogenic human toxicity potential
-        "ODP": None,
-        "PMFP": None,
-        "POFP": None,
-    }
-    for col in impact_cols:
-        processed_df[col] = None
-
-    # 4) Loop over each row and perform LCIA for the matched process
-    sp = bw.Database(ecoinvent_db_name)  # The ecoinvent database object
+    # 3) Create a float column for each registered impact category and each requested method
+    method_columns = [impact_column(method) for method in lcia_methods]
+    impact_columns = list(dict.fromkeys(list(IMPACT_CATEGORIES) + method_columns))
+    for col in impact_columns:
+        processed_df[col] = np.nan
+
+    # 4) Resolve each row to a database activity
+    with span(metrics, "activity_index"):
+        index = get_activity_index(ecoinvent_db_name, index_path)  # Built once per database version
+    row_keys = {}
     for idx, row in processed_df.iterrows():
+        activity_key = _activity_key(row.get("Activity key"), ecoinvent_db_name)
+        if activity_key is not None:
+            row_keys[idx] = activity_key
+            continue
+
         # Strip whitespace just in case
         process_name = str(row["Process"]).strip()
         location = str(row["Location"]).strip()
+        unit = str(row["Units"]).strip() if "Units" in processed_df.columns else None
 
         print(f"Checking process: {process_name} in {location}")
 
         # Find potential matches in the database
-        results = [
-            act for act in sp
-            if act["name"] == process_name and act["location"] == location
-        ]
+        with span(metrics, "activity_lookup"):
+            results = index.lookup(process_name, location, unit)
         print(f"Number of matches found: {len(results)}")
 
         if results:
-            selected_result = results[0]  # Example: select the first match
-            print(f"Selected match for '{process_name}' in '{location}': {selected_result}")
-
-            # Build the functional unit
-            functional_unit = {selected_result: 1}
-
-            # Calculate impact for each LCIA method
-            for method in lcia_methods:
-                lca = bw.LCA(functional_unit, method)
-                lca.lci()
-                lca.lcia()
-
-                if not isinstance(lca.score, (int, float)) or pd.isna(lca.score):
-                    print(f"Warning: LCA score for {method} is invalid (NaN or non-numeric).")
-                    continue
-
-                # Adjust by the 'In/out' quantity
-                adjusted_impact = abs(row["In/out"] * lca.score)
-
-                if "global warming potential (GWP100)" in method[2]:
-                    processed_df.at[idx, "GWP"] = adjusted_impact
-                elif "abiotic depletion potential (ADP)" in method[2]:
-                    processed_df.at[idx, "ADP"] = adjusted_impact
-                elif "user deprivation potential" in method[2]:
-                    processed_df.at[idx, "Water use"] = adjusted_impact
-                elif "accumulated exceedance (AE)" in method[2]:
-                    processed_df.at[idx, "AP"] = adjusted_impact
-                elif "comparative toxic unit for ecosystems (CTUe)" in method[2]:
-                    processed_df.at[idx, "FETP"] = adjusted_impact
-                elif "comparative toxic unit for human (CTUh)" in method[2]:
-                    processed_df.at[idx, "HTP"] = adjusted_impact
-                elif "ozone depletion potential (ODP)" in method[2]:
-                    processed_df.at[idx, "ODP"] = adjusted_impact
-                elif ("impact on human health" in method[2]) and ("particulate matter" in method[1]):
-                    processed_df.at[idx, "PMFP"] = adjusted_impact
-                elif "tropospheric ozone concentration increase" in method[2]:
-                    processed_df.at[idx, "POFP"] = adjusted_impact
+            row_keys[idx] = results[0]  # Example: select the first match
+            print(f"Selected match for '{process_name}' in '{location}': {results[0]}")
         else:
             print(f"No matches found for '{process_name}' in '{location}'")
 
-    # 5) Optionally remove rows where all impact columns are NaN
+    # 5) Take known per-unit scores from the cache, then factorize the technosphere
+    #    once and solve the remaining activities together for every method at once
+    unique_keys = list(dict.fromkeys(row_keys.values()))
+    unit_scores, _ = _unit_scores(
+        unique_keys, lcia_methods, ecoinvent_db_name, impact_cache, processes, metrics=metrics
+    )
+
+    # Gather the unit scores into an (activities x methods) matrix and scale every
+    # matched row by its 'In/out' quantity in one operation
+    if row_keys:
+        key_positions = {key: position for position, key in enumerate(unique_keys)}
+        unit_matrix = np.vstack([unit_scores[key] for key in unique_keys])
+        for method, column_scores in zip(lcia_methods, unit_matrix.T):
+            if np.isnan(column_scores).any():
+                print(f"Warning: LCA score for {method} is invalid (NaN or non-numeric).")
+
+        matched_rows = list(row_keys)
+        row_scores = unit_matrix[[key_positions[row_keys[idx]] for idx in matched_rows]]
+        amounts = processed_df.loc[matched_rows, "In/out"].to_numpy(dtype=float)
+        impacts = np.abs(amounts[:, np.newaxis] * row_scores)
+        for column, method_impacts in zip(method_columns, impacts.T):
+            processed_df.loc[matched_rows, column] = method_impacts
+
+    # 6) Optionally remove rows where all impact columns are NaN
     #    If your test expects the row to remain, comment this out or adapt it.
-    impact_columns = ["GWP", "ADP", "Water use", "AP", "FETP", "HTP", "ODP", "PMFP", "POFP"]
     processed_df.dropna(subset=impact_columns, how="all", inplace=True)
 
     return processed_df
+
+
+def iter_impact_assessment(
+    records,
+    lcia_methods: list,
+    ecoinvent_db_name: str = "ecoinvent-3.10.1-cutoff",
+    index_path: str = None,
+    impact_cache=None,
+    metrics=None
+):
+    """
+    Streaming impact stage: assesses match records one by one as they arrive,
+    e.g. from ``iter_process_dataframe``, so matching and impact assessment
+    overlap instead of running back to back.
+
+    The LCA matrices are built and factorized on the first matched record and
+    reused for the following ones.
+
+    Parameters
+    ----------
+    records : iterable of dict
+        Match records with the recommended dataset in 'selection' and the
+        inventory row (including 'In/out') in 'row'. An 'activity_key' in
+        this database is used without a name lookup.
+    lcia_methods : list
+        A list of LCIA method tuples.
+    ecoinvent_db_name : str, optional
+        The name of the ecoinvent database to use, by default 'ecoinvent-3.10.1-cutoff'.
+    index_path : str, optional
+        Path of the persisted activity index (see ``run_impact_assessment``).
+    impact_cache : UnitImpactCache, optional
+        Cache of per-unit scores (see ``run_impact_assessment``).
+    metrics : MetricsCollector, optional
+        Collector of stage timings (see ``run_impact_assessment``).
+
+    Yields
+    ------
+    dict
+        The record, extended with 'Process', 'Location', 'Units', the matched
+        activity 'key' (None if no match) and 'impacts', a {column: score} dict
+        scaled by the absolute 'In/out' quantity (empty if no match).
+    """
+    with span(metrics, "activity_index"):
+        index = get_activity_index(ecoinvent_db_name, index_path)
+    method_columns = [impact_column(method) for method in lcia_methods]
+    engine = None
+    for record in records:
+        process_name, location, unit = parse_ecoinvent_process(record["selection"])
+        key = _activity_key(record.get("activity_key"), ecoinvent_db_name)
+        if key is None:
+            with span(metrics, "activity_lookup"):
+                results = index.lookup(process_name, location, unit)
+            key = results[0] if results else None
+        impacts = {}
+        if key is not None:
+            unit_scores, engine = _unit_scores(
+                [key], lcia_methods, ecoinvent_db_name, impact_cache, engine=engine, metrics=metrics
+            )
+            amount = pd.to_numeric(record.get("row", {}).get("In/out", 0), errors="coerce")
+            amount = 0.0 if pd.isna(amount) else float(amount)
+            impacts = {
+                column: abs(amount * score) for column, score in zip(method_columns, unit_scores[key])
+            }
+        else:
+            print(f"No matches found for '{process_name}' in '{location}'")
+        yield {
+            **record,
+            "Process": process_name,
+            "Location": location,
+            "Units": unit,
+            "key": key,
+            "impacts": impacts,
+        }
@@ -0,0 +1,103 @@
+# impact_cache.py
+
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+import brightway2 as bw
+
+
+def method_version(method: tuple) -> str:
+    """
+    Returns a version stamp for an LCIA method, made of its number of
+    characterization factors and the modification time of its processed
+    array. It changes whenever the method data is rewritten.
+    """
+    metadata = bw.methods[method]
+    path = bw.Method(method).filepath_processed()
+    modified = os.path.getmtime(path) if os.path.exists(path) else ""
+    return f"{metadata.get('num_cfs', '')}:{modified}"
+
+
+class UnitImpactCache:
+    """
+    Persistent store of per-unit impact scores, backed by SQLite.
+
+    Scores are stored per (database, activity key, method) together with the
+    database and method versions they were computed from. A lookup only
+    succeeds if both versions still match, so entries are invalidated when
+    the database or the method data changes, and are overwritten on the next
+    calculation.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path of the SQLite file. Defaults to ':memory:', which keeps the cache
+        for the lifetime of the object only.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = str(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS unit_impacts ("
+            " database TEXT NOT NULL,"
+            " activity TEXT NOT NULL,"
+            " method TEXT NOT NULL,"
+            " database_version TEXT NOT NULL,"
+            " method_version TEXT NOT NULL,"
+            " score REAL,"
+            " PRIMARY KEY (database, activity, method))"
+        )
+        self._conn.commit()
+
+    def get(self, database: str, database_version: str, activity_key, methods: list, method_versions: list):
+        """
+        Returns the cached scores of one unit of an activity, one per method,
+        or None unless every method is cached with matching versions.
+        """
+        activity = json.dumps(list(activity_key))
+        scores = []
+        with self._lock:
+            for method, version in zip(methods, method_versions):
+                row = self._conn.execute(
+                    "SELECT score FROM unit_impacts WHERE database = ? AND activity = ? AND method = ?"
+                    " AND database_version = ? AND method_version = ?",
+                    (database, activity, json.dumps(list(method)), database_version, version),
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                scores.append(row[0])
+            self.hits += 1
+        return np.array(scores, dtype=float)
+
+    def set(self, database: str, database_version: str, activity_key, methods: list, method_versions: list, scores) -> None:
+        """Stores the scores of one unit of an activity, replacing stale entries."""
+        activity = json.dumps(list(activity_key))
+        rows = [
+            (database, activity, json.dumps(list(method)), database_version, version,
+             None if np.isnan(score) else float(score))
+            for method, version, score in zip(methods, method_versions, scores)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO unit_impacts"
+                " (database, activity, method, database_version, method_version, score)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters (per activity) and the number of stored scores."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM unit_impacts").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,192 @@
+# instrumentation.py
+
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from types import SimpleNamespace
+import pandas as pd
+
+_COUNTERS = ("chat_calls", "prompt_tokens", "completion_tokens")
+
+
+class MetricsCollector:
+    """
+    Records timed spans of the pipeline stages, with the chat completions and
+    tokens spent inside each one.
+
+    The stages recorded by ARIA are 'row' (one inventory row, end to end),
+    'search', 'refinement', 'alternatives', 'selection', 'activity_index'
+    (loading or building the activity index), 'activity_lookup', 'lci'
+    (building the LCA matrices) and 'lca_solve' (factorizing the technosphere
+    and solving the unit demands). Spans may be nested: a chat completion
+    counts towards every span open on its thread, so a 'row' span includes
+    the completions of its 'selection'.
+
+    Examples
+    --------
+    >>> metrics = MetricsCollector()
+    >>> df = process_dataframe(df, db, client, metrics=metrics)
+    >>> metrics.summary()
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, stage: str, **attributes):
+        """
+        Times the enclosed block as one span of ``stage``. Keyword arguments
+        (e.g. the row index) are stored with the span.
+        """
+        record = {"stage": stage, **attributes, **dict.fromkeys(_COUNTERS, 0)}
+        stack = self._stack()
+        stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["duration"] = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                self.spans.append(record)
+
+    def add_completion(self, usage=None) -> None:
+        """
+        Counts one chat completion, and the tokens of its ``usage``, towards
+        every open span. A completion made outside any span is recorded as a
+        span of its own, under 'chat_completion'.
+        """
+        counts = {
+            "chat_calls": 1,
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        }
+        stack = self._stack()
+        if not stack:
+            with self._lock:
+                self.spans.append({"stage": "chat_completion", **counts, "duration": 0.0})
+            return
+        # A span may be open on several threads at once (see ``bind_spans``)
+        with self._lock:
+            for record in stack:
+                for name, value in counts.items():
+                    record[name] += value
+
+    @contextmanager
+    def adopt(self, parents: list):
+        """
+        Opens the spans ``parents`` (records yielded by ``span`` on another
+        thread) on this thread for the enclosed block, so its completions also
+        count towards them. The spans are not recorded again.
+        """
+        previous = self._stack()
+        self._local.stack = list(parents) + previous
+        try:
+            yield
+        finally:
+            self._local.stack = previous
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Returns one row per stage with its number of spans, total, mean and
+        maximum duration in seconds, chat completions and tokens.
+        """
+        columns = ["stage", "count", "total_s", "mean_s", "max_s", *_COUNTERS]
+        with self._lock:
+            spans = pd.DataFrame(list(self.spans))
+        if spans.empty:
+            return pd.DataFrame(columns=columns)
+        grouped = spans.groupby("stage", sort=False)
+        summary = grouped["duration"].agg(count="count", total_s="sum", mean_s="mean", max_s="max")
+        summary = summary.join(grouped[list(_COUNTERS)].sum()).reset_index()
+        return summary[columns].sort_values("total_s", ascending=False, ignore_index=True)
+
+    def to_json(self, path: str = None) -> str:
+        """
+        Returns the summary and all spans as JSON, and writes it to ``path``
+        if given.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        payload = json.dumps(
+            {"summary": self.summary().to_dict(orient="records"), "spans": spans}, default=str, indent=2
+        )
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(payload)
+        return payload
+
+    def reset(self) -> None:
+        """Discards all recorded spans."""
+        with self._lock:
+            self.spans.clear()
+
+
+def span(metrics, stage: str, **attributes):
+    """
+    Returns ``metrics.span(stage, ...)``, or a no-op context manager when
+    ``metrics`` is None.
+    """
+    if metrics is None:
+        return nullcontext()
+    return metrics.span(stage, **attributes)
+
+
+def bind_spans(metrics, func):
+    """
+    Returns ``func`` wrapped so that, wherever it runs (e.g. on a thread
+    pool), its completions count towards the spans open on the calling
+    thread, such as the 'row' span of the row that submitted it. Returns
+    ``func`` unchanged when ``metrics`` is None.
+    """
+    if metrics is None:
+        return func
+    parents = list(metrics._stack())
+
+    def run(*args, **kwargs):
+        with metrics.adopt(parents):
+            return func(*args, **kwargs)
+
+    return run
+
+
+class InstrumentedClient:
+    """
+    Wraps an OpenAI-like client so every chat completion it makes is counted,
+    with its token usage, in a ``MetricsCollector``.
+
+    Parameters
+    ----------
+    client : Any
+        The OpenAI client (or module) performing the actual requests.
+    metrics : MetricsCollector
+        The collector to report to.
+    """
+
+    def __init__(self, client, metrics):
+        self.client = client
+        self.metrics = metrics
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        response = self.client.chat.completions.create(**kwargs)
+        self.metrics.add_completion(getattr(response, "usage", None))
+        return response
+
+
+def instrument(client, metrics=None):
+    """
+    Returns ``client`` wrapped in an ``InstrumentedClient`` when a collector
+    is given, or the client unchanged otherwise.
+    """
+    if metrics is None or (isinstance(client, InstrumentedClient) and client.metrics is metrics):
+        return client
+    return InstrumentedClient(client, metrics)
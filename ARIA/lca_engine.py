@@ -0,0 +1,196 @@
+# lca_engine.py
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import brightway2 as bw
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+# Matrices and factorization of a worker process, set up by _init_worker.
+_WORKER = {}
+
+
+class _SharedArrays:
+    """
+    Copies NumPy arrays into shared memory blocks once, so worker processes
+    can map them instead of receiving pickled copies.
+    """
+
+    def __init__(self, arrays: dict):
+        self.blocks = []
+        self.descriptors = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.descriptors[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self) -> None:
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+def _attach(descriptors: dict) -> tuple:
+    """Maps shared memory blocks back to arrays without copying them."""
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in descriptors.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+
+def _init_worker(descriptors: dict, shapes: dict) -> None:
+    """Attaches a worker to the shared matrices and factorizes the technosphere once."""
+    blocks, arrays = _attach(descriptors)
+    technosphere = sparse.csc_matrix(
+        (arrays["tech_data"], arrays["tech_indices"], arrays["tech_indptr"]), shape=shapes["technosphere"]
+    )
+    _WORKER["blocks"] = blocks  # Keep the mappings alive for the life of the worker
+    _WORKER["factorization"] = splu(technosphere)
+    _WORKER["biosphere"] = sparse.csr_matrix(
+        (arrays["bio_data"], arrays["bio_indices"], arrays["bio_indptr"]), shape=shapes["biosphere"]
+    )
+    _WORKER["characterization"] = sparse.csr_matrix(
+        (arrays["cf_data"], arrays["cf_indices"], arrays["cf_indptr"]), shape=shapes["characterization"]
+    )
+
+
+def _solve_chunk(product_rows: list) -> np.ndarray:
+    """Solves the unit demands of a chunk of products in a worker process."""
+    demand = np.zeros((_WORKER["factorization"].shape[0], len(product_rows)))
+    demand[product_rows, np.arange(len(product_rows))] = 1
+    supply = _WORKER["factorization"].solve(demand)
+    flows = _WORKER["biosphere"] @ supply
+    return np.asarray(_WORKER["characterization"] @ flows).T
+
+
+class LCAEngine:
+    """
+    Calculates per-unit impact scores of activities for several LCIA methods.
+
+    The technosphere and biosphere matrices are built once for all the given
+    activities, and the technosphere is factorized once. The characterization
+    factors of every method are stacked into a single (methods x biosphere
+    flows) matrix. A whole set of activities is then solved as one
+    multi-right-hand-side system, and all their scores come from one sparse
+    product.
+
+    Parameters
+    ----------
+    activity_keys : iterable
+        Keys of the activities that will be assessed.
+    lcia_methods : list
+        A list of LCIA method tuples.
+    """
+
+    def __init__(self, activity_keys, lcia_methods: list):
+        self.lcia_methods = list(lcia_methods)
+        self.lca = bw.LCA({key: 1 for key in activity_keys}, self.lcia_methods[0] if self.lcia_methods else None)
+        # Only build the matrices: lci() would also solve the combined demand,
+        # a second factorization on top of the one in ``factorize``.
+        self.lca.load_lci_data()
+        self.characterization_stack = self._build_characterization_stack()
+        self._factorization = None
+
+    def _build_characterization_stack(self):
+        """Stacks the diagonal of each method's characterization matrix."""
+        factors = []
+        for method in self.lcia_methods:
+            self.lca.switch_method(method)
+            factors.append(self.lca.characterization_matrix.diagonal())
+        if not factors:
+            return sparse.csr_matrix((0, self.lca.biosphere_matrix.shape[0]))
+        return sparse.csr_matrix(np.vstack(factors))
+
+    def factorize(self):
+        """Returns the LU factorization of the technosphere, computing it on first use."""
+        if self._factorization is None:
+            self._factorization = splu(sparse.csc_matrix(self.lca.technosphere_matrix))
+        return self._factorization
+
+    def unit_score_matrix(self, activity_keys, chunk_size: int = 256, processes: int = None) -> np.ndarray:
+        """
+        Returns the impact scores of one unit of each activity.
+
+        Parameters
+        ----------
+        activity_keys : iterable
+            Keys of the activities to assess.
+        chunk_size : int, optional
+            Maximum number of demand vectors solved together, which bounds the
+            size of the dense right-hand side and supply arrays.
+        processes : int, optional
+            If greater than 1 and there are several activities, they are split
+            evenly over up to this many worker processes (see
+            ``_unit_score_matrix_parallel``). Defaults to a serial solve.
+
+        Returns
+        -------
+        np.ndarray
+            A float array of shape (number of activities, number of methods),
+            with rows in the order of ``activity_keys`` and columns in the
+            order of ``lcia_methods``.
+        """
+        keys = list(activity_keys)
+        if processes and processes > 1 and len(keys) > 1:
+            return self._unit_score_matrix_parallel(keys, chunk_size, processes)
+        scores = np.empty((len(keys), len(self.lcia_methods)), dtype=float)
+        factorization = self.factorize()
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            demand = np.zeros((len(self.lca.product_dict), len(chunk)))
+            for column, key in enumerate(chunk):
+                demand[self.lca.product_dict[key], column] = 1
+            supply = factorization.solve(demand)
+            flows = self.lca.biosphere_matrix @ supply
+            scores[start:start + len(chunk)] = np.asarray(self.characterization_stack @ flows).T
+        return scores
+
+    def _unit_score_matrix_parallel(self, keys: list, chunk_size: int, processes: int) -> np.ndarray:
+        """
+        Spreads the chunks of ``unit_score_matrix`` over a pool of worker processes.
+
+        The technosphere, biosphere and characterization matrices are placed in
+        shared memory once; every worker maps them without copying, factorizes
+        the technosphere once, and solves the chunks it is given. The keys are
+        split into at least ``processes`` chunks of at most ``chunk_size``, so
+        every worker has work, and no more workers are started than there are
+        chunks, since each one pays for its own factorization. Results are
+        gathered back in the order of ``keys``.
+        """
+        technosphere = sparse.csc_matrix(self.lca.technosphere_matrix)
+        biosphere = sparse.csr_matrix(self.lca.biosphere_matrix)
+        characterization = sparse.csr_matrix(self.characterization_stack)
+        shared = _SharedArrays({
+            "tech_data": technosphere.data, "tech_indices": technosphere.indices, "tech_indptr": technosphere.indptr,
+            "bio_data": biosphere.data, "bio_indices": biosphere.indices, "bio_indptr": biosphere.indptr,
+            "cf_data": characterization.data, "cf_indices": characterization.indices, "cf_indptr": characterization.indptr,
+        })
+        shapes = {
+            "technosphere": technosphere.shape,
+            "biosphere": biosphere.shape,
+            "characterization": characterization.shape,
+        }
+        product_rows = [self.lca.product_dict[key] for key in keys]
+        chunk_size = max(1, min(chunk_size, math.ceil(len(keys) / processes)))
+        chunks = [product_rows[start:start + chunk_size] for start in range(0, len(keys), chunk_size)]
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(processes, len(chunks)), initializer=_init_worker, initargs=(shared.descriptors, shapes)
+            ) as executor:
+                results = list(executor.map(_solve_chunk, chunks))
+        finally:
+            shared.close()
+        return np.vstack(results).astype(float)
+
+    def unit_scores(self, activity_key) -> np.ndarray:
+        """
+        Returns the impact scores of one unit of an activity, one per method,
+        in the order of ``lcia_methods``.
+        """
+        return self.unit_score_matrix([activity_key])[0]
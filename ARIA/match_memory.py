@@ -0,0 +1,196 @@
+# match_memory.py
+
+import json
+import sqlite3
+import threading
+import time
+import pandas as pd
+from .activity_index import database_version, get_activity_index
+from .coalescing import match_key
+from .ecoinvent_processing import parse_ecoinvent_process
+
+
+def _memory_key(activity: str, notes: str, locations) -> tuple:
+    """
+    Normalizes an (activity, notes, locations) triple the same way the search
+    workflow keys its matches (see ``match_key``), without the user message:
+    an approved mapping holds whatever extra instructions a run is given.
+    Locations default to ["GLO", "RoW"], as in ``process_dataframe``.
+    """
+    if locations is None:
+        locations = ["GLO", "RoW"]
+    activity, notes, _, locations = match_key(activity, notes, "", locations)
+    return activity, notes, json.dumps(list(locations))
+
+
+def _notes(value) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+
+class MatchMemory:
+    """
+    Persistent store of curated activity -> dataset mappings, backed by SQLite.
+
+    Each entry maps an inventory activity name, its notes and the location
+    preferences of the run to the selected dataset and its Brightway key.
+    Entries belong to one database release: a store opened for another
+    release does not see them, so mappings are never applied to datasets
+    they were not approved for, while analysts working on the same release
+    can share one store. Pass a store to ``process_dataframe`` to resolve
+    known flows before any search or chat completion.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path of the SQLite file. Defaults to an in-memory database.
+    database : str, optional
+        Name of the Ecoinvent database the mappings point into.
+    release : str, optional
+        The release of that database, e.g. "3.10.1 cutoff". Defaults to the
+        database name, which names the release in the usual Brightway setup.
+    check_modified : bool, optional
+        If True, entries also record the database's ``database_version``
+        (the local 'modified' timestamp) and are ignored once the database
+        has been written to since. Defaults to False: the timestamp differs
+        between machines importing the same release.
+    index_path : str, optional
+        Passed on to ``get_activity_index`` when ``approve`` resolves the
+        activity keys of the approved datasets.
+    """
+
+    def __init__(self, path: str = ":memory:", database: str = "ecoinvent-3.10.1-cutoff", release: str = None,
+                 check_modified: bool = False, index_path: str = None):
+        self.path = str(path)
+        self.database = database
+        self.release = database if release is None else str(release)
+        self.modified = database_version(database) if check_modified else ""
+        self.index_path = index_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS matches ("
+            " database TEXT NOT NULL,"
+            " release TEXT NOT NULL,"
+            " activity TEXT NOT NULL,"
+            " notes TEXT NOT NULL,"
+            " locations TEXT NOT NULL,"
+            " selection TEXT NOT NULL,"
+            " activity_key TEXT NOT NULL,"
+            " modified TEXT NOT NULL,"
+            " approved REAL NOT NULL,"
+            " PRIMARY KEY (database, release, activity, notes, locations))"
+        )
+        self._conn.commit()
+
+    def get(self, activity: str, notes: str = "", locations=None):
+        """
+        Returns the approved match of an activity as a dict with 'selection'
+        and 'activity_key', or None if it has none in this release.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT selection, activity_key, modified FROM matches"
+                " WHERE database = ? AND release = ? AND activity = ? AND notes = ? AND locations = ?",
+                (self.database, self.release, *_memory_key(activity, notes, locations)),
+            ).fetchone()
+            if row is None or (self.modified and row[2] != self.modified):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"selection": row[0], "activity_key": tuple(json.loads(row[1]))}
+
+    def remember(self, activity: str, notes: str, locations, selection: str, activity_key) -> None:
+        """Stores (or replaces) the approved match of a single activity."""
+        self._store([(activity, notes, locations, selection, activity_key)])
+
+    def approve(self, matches, locations=None, index=None) -> int:
+        """
+        Stores reviewed matches in bulk.
+
+        The activity key of every match is resolved from its selection text
+        with the database's activity index, so a selection corrected by hand
+        is stored with the key of the corrected dataset, not the one the run
+        had selected.
+
+        Parameters
+        ----------
+        matches : pd.DataFrame or iterable of dict
+            Either a DataFrame returned by ``process_dataframe`` (columns
+            'Input/output', optionally 'Notes', 'Ecoinvent process' and
+            'Activity key'), e.g. after correcting it by hand, or match
+            records yielded by ``iter_process_dataframe``.
+        locations : list of str, optional
+            The location preferences the matches were made with. Defaults to
+            ["GLO", "RoW"], as in ``process_dataframe``.
+        index : ActivityIndex, optional
+            The index used to resolve the selections. Defaults to
+            ``get_activity_index`` of the store's database.
+
+        Returns
+        -------
+        int
+            The number of stored entries. Rows whose selection names no
+            dataset of the database are skipped.
+        """
+        if isinstance(matches, pd.DataFrame):
+            notes = matches["Notes"] if "Notes" in matches else [""] * len(matches)
+            keys = matches["Activity key"] if "Activity key" in matches else [None] * len(matches)
+            matches = (
+                {"activity": activity, "notes": note, "selection": selection, "activity_key": key}
+                for activity, note, selection, key in zip(matches["Input/output"], notes, matches["Ecoinvent process"], keys)
+            )
+        if index is None:
+            index = get_activity_index(self.database, self.index_path)
+        entries = []
+        for record in matches:
+            name, location, unit = parse_ecoinvent_process(record.get("selection") or "")
+            keys = index.lookup(name, location, unit) if name and location else []
+            if not keys:
+                continue
+            # Keep the run's key if it is one of the datasets the selection names
+            key = record.get("activity_key")
+            key = tuple(key) if isinstance(key, (tuple, list)) and tuple(key) in keys else keys[0]
+            entries.append((record["activity"], _notes(record.get("notes")), locations, record["selection"], key))
+        self._store(entries)
+        return len(entries)
+
+    def _store(self, entries: list) -> None:
+        now = time.time()
+        rows = [
+            (self.database, self.release, *_memory_key(activity, notes, locations),
+             str(selection), json.dumps(list(activity_key)), self.modified, now)
+            for activity, notes, locations, selection, activity_key in entries
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO matches"
+                " (database, release, activity, notes, locations, selection, activity_key, modified, approved)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def forget(self, activity: str, notes: str = "", locations=None) -> None:
+        """Removes the approved match of an activity from this release."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM matches"
+                " WHERE database = ? AND release = ? AND activity = ? AND notes = ? AND locations = ?",
+                (self.database, self.release, *_memory_key(activity, notes, locations)),
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters and the number of entries for this release."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM matches WHERE database = ? AND release = ?", (self.database, self.release)
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
@@ -1,16 +1,28 @@
 #openai_client.py
 import openai
 import os
+import random
+import threading
+import time
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from types import SimpleNamespace
 
-# Try to load the default API key from the environment variable first
-default_api_key = os.getenv("OPENAI_API_KEY")
 
-# If not set in environment, try to load from credentials.py
-if default_api_key is None:
-    try:
-        from credentials import OPENAI_API_KEY as default_api_key
-    except ImportError:
-        default_api_key = None
+def _default_api_key():
+    """
+    Returns the OpenAI API key from the OPENAI_API_KEY environment variable,
+    or else from credentials.py, or None if neither is set.
+    """
+    # Try to load the default API key from the environment variable first
+    api_key = os.getenv("OPENAI_API_KEY")
+
+    # If not set in environment, try to load from credentials.py
+    if api_key is None:
+        try:
+            from credentials import OPENAI_API_KEY as api_key
+        except ImportError:
+            api_key = None
+    return api_key
 
 def create_openai_client(api_key: str = None):
     """
@@ -31,10 +43,7 @@ def create_openai_client(api_key: str = None):
         The openai module with the API key configured.
     """
     if api_key is None:
-        if default_api_key:
-            api_key = default_api_key
-        else:
-            api_key = os.getenv("OPENAI_API_KEY")
+        api_key = _default_api_key()
         if not api_key:
             raise ValueError(
                 "No API key found. Please set the OPENAI_API_KEY environment variable, "
@@ -42,3 +51,231 @@ def create_openai_client(api_key: str = None):
             )
     openai.api_key = api_key
     return openai
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Returns True for API errors worth retrying: rate limits (429), timeouts,
+    conflicts, server errors (5xx) and dropped connections.
+    """
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return isinstance(error, (TimeoutError, ConnectionError, openai.APIConnectionError))
+
+
+def _retry_after(error: Exception):
+    """Returns the server's Retry-After delay in seconds, if the error carries one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at ``per_minute`` tokens
+    per minute, holding at most one minute's worth of tokens.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Blocks until ``amount`` tokens are available and takes them. Returns
+        the time waited, in seconds.
+        """
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def estimate_tokens(kwargs: dict) -> int:
+    """
+    Estimates the tokens a chat completion request will use: about four
+    characters per prompt token, plus the requested ``max_tokens``.
+    """
+    prompt = sum(len(str(message.get("content", ""))) for message in kwargs.get("messages", []))
+    return prompt // 4 + int(kwargs.get("max_tokens") or 0)
+
+
+class RateLimitedClient:
+    """
+    Wraps an OpenAI-like client with client-side rate limiting, retries and
+    optional request hedging, and exposes the same ``chat.completions.create``.
+
+    A single instance should be shared by all threads of a run (and between
+    runs), so the limits hold for the process as a whole.
+
+    Parameters
+    ----------
+    client : Any
+        The OpenAI client (or module) performing the actual requests.
+    requests_per_minute : float, optional
+        Maximum request rate. Unlimited if None.
+    tokens_per_minute : float, optional
+        Maximum token rate, using ``estimate_tokens`` for each request.
+        Unlimited if None.
+    max_retries : int, optional
+        Number of retries of a request failing with a transient error
+        (429, 5xx, timeouts, dropped connections). Other errors are raised
+        immediately.
+    backoff_base : float, optional
+        Upper bound of the first retry delay in seconds. The bound doubles with
+        every attempt, up to ``backoff_max``, and the actual delay is drawn
+        uniformly below it ("full jitter"). A Retry-After header takes precedence.
+    backoff_max : float, optional
+        Largest retry delay in seconds.
+    timeout : float, optional
+        Per-request timeout in seconds, passed on to the client.
+    hedge_after : float, optional
+        If a request has not completed this many seconds after it was sent, a
+        duplicate is sent and whichever answers first is used. This trims tail
+        latency at the cost of some extra requests. Time spent waiting on the
+        rate limits does not count. Disabled if None.
+    """
+
+    def __init__(
+        self,
+        client,
+        requests_per_minute: float = None,
+        tokens_per_minute: float = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        timeout: float = None,
+        hedge_after: float = None
+    ):
+        self.client = client
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.throttled = 0.0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _send(self, kwargs: dict, sent: threading.Event = None):
+        """Sends one request once its share of the rate limits is available."""
+        waited = 0.0
+        if self.request_bucket is not None:
+            waited += self.request_bucket.acquire(1)
+        if self.token_bucket is not None:
+            waited += self.token_bucket.acquire(estimate_tokens(kwargs))
+        with self._lock:
+            self.requests += 1
+            self.throttled += waited
+        if sent is not None:
+            sent.set()
+        return self.client.chat.completions.create(**kwargs)
+
+    def _submit(self, kwargs: dict, sent: threading.Event = None) -> Future:
+        """
+        Sends a request on a thread of its own. Each request gets its own
+        thread rather than a slot in a fixed pool, so no request waits behind
+        others, however many rows the caller processes concurrently.
+        """
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(self._send(kwargs, sent))
+            except BaseException as error:
+                future.set_exception(error)
+            finally:
+                if sent is not None:
+                    sent.set()
+
+        threading.Thread(target=run, name="aria-request", daemon=True).start()
+        return future
+
+    def _send_hedged(self, kwargs: dict):
+        """Sends a request, and a duplicate if the first is slower than ``hedge_after``."""
+        if not self.hedge_after:
+            return self._send(kwargs)
+        sent = threading.Event()
+        futures = [self._submit(kwargs, sent)]
+        # Start the clock when the request goes out, not while it waits on the rate limits
+        sent.wait()
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            with self._lock:
+                self.hedges += 1
+            futures.append(self._submit(kwargs))
+        pending, error = set(futures), None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _create(self, **kwargs):
+        if self.timeout is not None:
+            kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._send_hedged(kwargs)
+            except Exception as error:
+                if attempt == self.max_retries or not is_transient_error(error):
+                    raise
+                delay = _retry_after(error)
+                if delay is None:
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        """Returns the number of requests sent, retries, hedged duplicates and seconds spent throttled."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "throttled_seconds": self.throttled,
+            }
+
+
+def create_rate_limited_client(api_key: str = None, **limits) -> RateLimitedClient:
+    """
+    Creates an OpenAI client with ``create_openai_client`` and wraps it in a
+    ``RateLimitedClient``.
+
+    Parameters
+    ----------
+    api_key : str, optional
+        The OpenAI API key (see ``create_openai_client``).
+    **limits
+        Keyword arguments of ``RateLimitedClient``, e.g. requests_per_minute=500,
+        tokens_per_minute=200000, timeout=30.
+
+    Returns
+    -------
+    RateLimitedClient
+        The wrapped client, to be passed to ``process_dataframe``.
+    """
+    return RateLimitedClient(create_openai_client(api_key), **limits)
@@ -0,0 +1,156 @@
+# portfolio.py
+
+import os
+from glob import glob
+import pandas as pd
+from .data_handling import read_and_clean_excel
+from .search_workflow import process_dataframe, _row_notes
+from .ecoinvent_processing import parse_ecoinvent_process
+from .impact_assessment import run_impact_assessment
+
+
+def _product_name(file_path: str) -> str:
+    """Names a product after its inventory file, e.g. 'Data_inputs_battery.xlsx' -> 'battery'."""
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return name[len("Data_inputs_"):] if name.startswith("Data_inputs_") and len(name) > 12 else name
+
+
+def load_inventories(inventories, pattern: str = "*.xlsx", **read_kwargs) -> dict:
+    """
+    Reads a set of inventories into {product name: DataFrame}.
+
+    Parameters
+    ----------
+    inventories : str, list or dict
+        A directory (every file matching ``pattern`` is read), a list of
+        Excel file paths, or a {product name: DataFrame} dict, returned as is.
+    pattern : str, optional
+        Glob pattern of the inventory files in a directory.
+    **read_kwargs
+        Passed on to ``read_and_clean_excel`` (e.g. usecols, nrows).
+
+    Returns
+    -------
+    dict
+        The inventories, keyed by product name.
+    """
+    if isinstance(inventories, dict):
+        return dict(inventories)
+    if isinstance(inventories, (str, os.PathLike)):
+        paths = sorted(glob(os.path.join(inventories, pattern)))
+    else:
+        paths = list(inventories)
+    return {_product_name(str(path)): read_and_clean_excel(path, **read_kwargs) for path in paths}
+
+
+def run_portfolio(
+    inventories,
+    db,
+    client,
+    lcia_methods: list,
+    output_dir: str = None,
+    user_message: str = "",
+    locations: list = None,
+    ecoinvent_db_name: str = "ecoinvent-3.10.1-cutoff",
+    verbose: bool = False,
+    cache=None,
+    max_workers: int = 1,
+    batch_size: int = None,
+    index_path: str = None,
+    impact_cache=None,
+    processes: int = None,
+    metrics=None,
+    match_memory=None,
+    **read_kwargs
+) -> dict:
+    """
+    Assesses many product inventories in one run.
+
+    Rows are deduplicated across all inventories by activity name and notes,
+    so every unique activity is searched and matched by ChatGPT once, and the
+    technosphere is factorized once for all matched datasets. Runtime then
+    grows with the number of unique activities rather than total rows.
+
+    Parameters
+    ----------
+    inventories : str, list or dict
+        A directory of Data_inputs workbooks, a list of workbook paths, or a
+        {product name: DataFrame} dict (see ``load_inventories``).
+    db : brightway2.Database
+        The Ecoinvent database object (or an ActivityRetrievalIndex) to search.
+    client : Any
+        An OpenAI-like client that can make chat completion calls.
+    lcia_methods : list
+        A list of LCIA method tuples.
+    output_dir : str, optional
+        If given, every product's result table is written to
+        '<output_dir>/<product>_results.csv'.
+    user_message, locations, verbose, cache, max_workers, batch_size, match_memory : optional
+        Passed on to ``process_dataframe``.
+    ecoinvent_db_name, index_path, impact_cache, processes : optional
+        Passed on to ``run_impact_assessment``.
+    metrics : MetricsCollector, optional
+        Collector of stage timings and token usage for the whole run.
+    **read_kwargs
+        Passed on to ``read_and_clean_excel``.
+
+    Returns
+    -------
+    dict
+        {product name: DataFrame}, each with the matched datasets and impact
+        category columns, as returned by ``run_impact_assessment``.
+    """
+    products = load_inventories(inventories, **read_kwargs)
+
+    # 1) Collect the unique (activity, notes) pairs of all inventories
+    unique_rows = {}
+    for data_frame in products.values():
+        for _, row in data_frame.iterrows():
+            key = (str(row["Input/output"]).strip().lower(), _row_notes(row))
+            unique_rows.setdefault(key, {"Input/output": key[0], "Notes": key[1]})
+    if verbose:
+        total = sum(len(data_frame) for data_frame in products.values())
+        print(f"{len(products)} inventories, {total} rows, {len(unique_rows)} unique activities.")
+
+    # 2) Match every unique activity once
+    unique_df = pd.DataFrame(list(unique_rows.values()), columns=["Input/output", "Notes"])
+    unique_df = process_dataframe(
+        unique_df, db, client, user_message=user_message, locations=locations, verbose=verbose,
+        cache=cache, max_workers=max_workers, batch_size=batch_size, metrics=metrics,
+        match_memory=match_memory,
+    )
+    selections = dict(zip(unique_rows, zip(unique_df["Ecoinvent process"], unique_df["Activity key"])))
+
+    # 3) Assess all products together, so the LCA is built and solved once
+    frames = []
+    for product, data_frame in products.items():
+        data_frame = data_frame.copy()
+        matches = [
+            selections[(str(row["Input/output"]).strip().lower(), _row_notes(row))]
+            for _, row in data_frame.iterrows()
+        ]
+        data_frame["Activity key"] = pd.Series([key for _, key in matches], index=data_frame.index, dtype=object)
+        # Parsed row by row, so a selection naming no dataset cannot fail the whole product
+        parsed = [parse_ecoinvent_process(selection) for selection, _ in matches]
+        data_frame["Units"] = [unit for _, _, unit in parsed]
+        data_frame["Process"] = [process for process, _, _ in parsed]
+        data_frame["Location"] = [location for _, location, _ in parsed]
+        data_frame.insert(0, "Product", product)
+        frames.append(data_frame)
+    if not frames:
+        return {}
+    combined = pd.concat(frames, ignore_index=True)
+    combined = run_impact_assessment(
+        combined, lcia_methods, ecoinvent_db_name=ecoinvent_db_name, index_path=index_path,
+        impact_cache=impact_cache, processes=processes, metrics=metrics,
+    )
+
+    # 4) Split the results back into one table per product
+    results = {}
+    for product in products:
+        table = combined[combined["Product"] == product].drop(columns="Product").reset_index(drop=True)
+        results[product] = table
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            table.to_csv(os.path.join(output_dir, f"{product}_results.csv"), index=False)
+    return results
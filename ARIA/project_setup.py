@@ -8,17 +8,25 @@ except ModuleNotFoundError as e:
         "Brightway2 is not installed. Please run 'pip install brightway2' in your environment."
     ) from e
 
-# First, try to fetch credentials from environment variables
-ECOINVENT_USERNAME = os.getenv('ECOINVENT_USERNAME')
-ECOINVENT_PASSWORD = os.getenv('ECOINVENT_PASSWORD')
 
-# If not set in environment, try to load from credentials.py
-if ECOINVENT_USERNAME is None or ECOINVENT_PASSWORD is None:
-    try:
-        from credentials import ECOINVENT_USERNAME, ECOINVENT_PASSWORD
-    except ImportError:
-        raise ImportError("Please create a 'credentials.py' file with your confidential keys.")
-        
+def _default_credentials() -> tuple:
+    """
+    Returns the ecoinvent username and password from the ECOINVENT_USERNAME and
+    ECOINVENT_PASSWORD environment variables, or else from credentials.py.
+    """
+    # First, try to fetch credentials from environment variables
+    username = os.getenv('ECOINVENT_USERNAME')
+    password = os.getenv('ECOINVENT_PASSWORD')
+
+    # If not set in environment, try to load from credentials.py
+    if username is None or password is None:
+        try:
+            from credentials import ECOINVENT_USERNAME as username, ECOINVENT_PASSWORD as password
+        except ImportError:
+            raise ImportError("Please create a 'credentials.py' file with your confidential keys.")
+    return username, password
+
+
 def setup_brightway_project(
     project_name: str,
     ecoinvent_version: str,
@@ -39,20 +47,22 @@ def setup_brightway_project(
     system_model : str
         The system model for the ecoinvent release (e.g., 'cutoff', 'apos', 'consequential').
     username : str, optional
-        Ecoinvent username. If None, the value from credentials.py is used.
+        Ecoinvent username. If None, the ECOINVENT_USERNAME environment
+        variable or the value from credentials.py is used.
     password : str, optional
-        Ecoinvent password. If None, the value from credentials.py is used.
+        Ecoinvent password. If None, the ECOINVENT_PASSWORD environment
+        variable or the value from credentials.py is used.
 
     Returns
     -------
     bw.Database
         The Brightway2 database object for the imported (or existing) ecoinvent DB.
     """
-    # Use credentials from credentials.py if none provided.
-    if username is None:
-        username = ECOINVENT_USERNAME
-    if password is None:
-        password = ECOINVENT_PASSWORD
+    # Use credentials from the environment or credentials.py if none provided.
+    if username is None or password is None:
+        default_username, default_password = _default_credentials()
+        username = default_username if username is None else username
+        password = default_password if password is None else password
 
     # Set the current project (creates it if it doesn't exist)
     bw.projects.set_current(project_name)
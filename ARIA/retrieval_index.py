@@ -0,0 +1,240 @@
+# retrieval_index.py
+
+import json
+import os
+import re
+import numpy as np
+from scipy import sparse
+
+_ARRAY_FILES = ("data", "indices", "indptr", "idf")
+
+# Weights of the trigram similarity, the share of query words found in the
+# activity, and the exact-phrase match in the score of a result.
+_TRIGRAM_WEIGHT, _WORD_WEIGHT, _PHRASE_WEIGHT = 0.6, 0.25, 0.15
+# Words are compared on their first characters, so plurals and spelling
+# variants ("graphites", "aluminum") still count as the same word.
+_STEM_LENGTH = 5
+
+
+def _normalize(text: str) -> str:
+    """Lowercases text, drops wildcard and punctuation characters, and collapses spaces."""
+    text = re.sub(r"[^\w\s]", " ", str(text).lower())
+    return " ".join(text.split())
+
+
+def _char_ngrams(text: str, n: int = 3) -> list[str]:
+    """Returns the character n-grams of every word, padded with spaces."""
+    grams = []
+    for word in _normalize(text).split():
+        padded = f" {word} "
+        grams.extend(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+    return grams
+
+
+def _stems(text: str) -> set[str]:
+    return {word[:_STEM_LENGTH] for word in _normalize(text).split()}
+
+
+def _document_text(activity) -> str:
+    # The name is repeated so it weighs more than the reference product, location and unit.
+    return " ".join([
+        activity.get("name", ""),
+        activity.get("name", ""),
+        activity.get("reference product", "") or "",
+        activity.get("location", "") or "",
+        activity.get("unit", "") or "",
+    ])
+
+
+class ActivityRetrievalIndex:
+    """
+    Offline TF-IDF index over character trigrams of activity name, reference
+    product, location and unit.
+
+    The index is an inverted (n-gram x activity) sparse matrix, so a query only
+    touches the rows of its own n-grams. The best trigram matches are then
+    rescored with the share of query words they contain and whether they
+    contain the query as a phrase, so the activity named exactly by a query
+    ranks first and a query sharing only trigrams with an activity scores
+    low. Its ``search`` method takes the same arguments as
+    ``bw.Database.search`` and can be passed to ``process_dataframe`` in
+    place of the database. Wildcard queries such as
+    "*waste* *graphite*" are accepted, and near matches (plurals, spelling
+    variants, word order) are found on the first search.
+
+    Parameters
+    ----------
+    records : list of dict
+        One record (name, reference product, location, unit, key) per activity.
+    vocabulary : dict
+        Maps each n-gram to its row in ``matrix``.
+    idf : np.ndarray
+        Inverse document frequency of each n-gram.
+    matrix : scipy.sparse.csr_matrix
+        L2-normalized TF-IDF weights, of shape (n-grams, activities).
+    """
+
+    def __init__(self, records: list, vocabulary: dict, idf, matrix):
+        self.records = records
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.matrix = matrix
+        self._locations = np.array([record["location"] for record in records], dtype=object)
+        self._names = [_normalize(record["name"]) for record in records]
+        self._words = [_stems(f"{record['name']} {record['reference product']}") for record in records]
+
+    @classmethod
+    def build(cls, activities) -> "ActivityRetrievalIndex":
+        """
+        Builds the index from an iterable of activities, e.g. a ``bw.Database``.
+        """
+        records, documents = [], []
+        for activity in activities:
+            key = getattr(activity, "key", None)
+            records.append({
+                "name": activity.get("name", ""),
+                "reference product": activity.get("reference product", "") or "",
+                "location": activity.get("location", "") or "",
+                "unit": activity.get("unit", "") or "",
+                "key": list(key) if key else None,
+            })
+            documents.append(_char_ngrams(_document_text(activity)))
+
+        vocabulary = {}
+        rows, cols, counts = [], [], []
+        for col, grams in enumerate(documents):
+            unique, frequency = np.unique(grams, return_counts=True) if grams else ([], [])
+            for gram, count in zip(unique, frequency):
+                rows.append(vocabulary.setdefault(gram, len(vocabulary)))
+                cols.append(col)
+                counts.append(count)
+
+        shape = (len(vocabulary), len(records))
+        term_counts = sparse.csr_matrix((np.asarray(counts, dtype=float), (rows, cols)), shape=shape)
+        document_frequency = np.diff(term_counts.indptr)
+        idf = np.log((1 + len(records)) / (1 + document_frequency)) + 1
+        weights = term_counts.copy()
+        weights.data = (1 + np.log(weights.data)) * np.repeat(idf, document_frequency)
+
+        # Normalize every activity (column) to unit length
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=0)).ravel())
+        norms[norms == 0] = 1
+        matrix = sparse.csr_matrix(weights @ sparse.diags(1 / norms))
+        return cls(records, vocabulary, idf, matrix)
+
+    def _query_vector(self, query: str) -> tuple:
+        grams, counts = np.unique(_char_ngrams(query), return_counts=True)
+        rows, weights = [], []
+        for gram, count in zip(grams, counts):
+            row = self.vocabulary.get(gram)
+            if row is not None:
+                rows.append(row)
+                weights.append((1 + np.log(count)) * self.idf[row])
+        weights = np.asarray(weights, dtype=float)
+        norm = np.linalg.norm(weights)
+        return rows, weights / norm if norm else weights
+
+    def _rescore(self, query: str, positions, similarities) -> np.ndarray:
+        """Combines the trigram similarities of some activities with their word and phrase matches."""
+        phrase = _normalize(query)
+        words = _stems(phrase)
+        scores = []
+        for position, similarity in zip(positions, similarities):
+            name = self._names[position]
+            coverage = len(words & self._words[position]) / len(words) if words else 0.0
+            exact = 1.0 if name == phrase else 0.5 if f" {phrase} " in f" {name} " else 0.0
+            scores.append(_TRIGRAM_WEIGHT * similarity + _WORD_WEIGHT * coverage + _PHRASE_WEIGHT * exact)
+        return np.asarray(scores, dtype=float)
+
+    def search(self, query: str, limit: int = 50, filter: dict = None, min_score: float = 0.35) -> list[dict]:
+        """
+        Returns the activities most similar to a query, best first.
+
+        Parameters
+        ----------
+        query : str
+            Free text or a wildcard query built by ``build_search_query``.
+        limit : int, optional
+            Maximum number of results.
+        filter : dict, optional
+            Exact-match conditions on record fields, e.g. {"location": "GLO"}.
+        min_score : float, optional
+            Score below which results are discarded. The score is at most 1,
+            for the activity named exactly by the query; an activity sharing
+            no word with the query scores at most 0.6.
+
+        Returns
+        -------
+        list[dict]
+            Records with 'name', 'reference product', 'location', 'unit',
+            'key' and their 'score'.
+        """
+        rows, weights = self._query_vector(query)
+        if not rows:
+            return []
+        scores = np.asarray(self.matrix[rows].T @ weights).ravel()
+        for field, value in (filter or {}).items():
+            if field == "location":
+                scores[self._locations != value] = 0
+            else:
+                mask = np.array([record.get(field) != value for record in self.records])
+                scores[mask] = 0
+
+        # Only the best trigram matches are rescored; the word and phrase terms
+        # can lift a result by at most 0.4, which a much weaker one cannot make up.
+        candidates = np.flatnonzero(scores > 0)
+        pool = max(4 * limit, 200)
+        if len(candidates) > pool:
+            candidates = candidates[np.argpartition(-scores[candidates], pool - 1)[:pool]]
+        rescored = self._rescore(query, candidates, scores[candidates])
+        keep = rescored >= min_score
+        candidates, rescored = candidates[keep], rescored[keep]
+        order = np.lexsort((candidates, -rescored))[:limit]
+
+        results = []
+        for position, score in zip(candidates[order], rescored[order]):
+            record = dict(self.records[position])
+            if record["key"] is not None:
+                record["key"] = tuple(record["key"])
+            record["score"] = float(score)
+            results.append(record)
+        return results
+
+    def save(self, directory: str) -> None:
+        """
+        Writes the index to a directory: the sparse matrix and idf as .npy
+        arrays, and the vocabulary and records as JSON.
+        """
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            "data": self.matrix.data,
+            "indices": self.matrix.indices,
+            "indptr": self.matrix.indptr,
+            "idf": self.idf,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), np.asarray(array))
+        with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as handle:
+            json.dump({"vocabulary": self.vocabulary, "records": self.records}, handle)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "ActivityRetrievalIndex":
+        """
+        Reads an index written by ``save``. With ``mmap=True`` the arrays are
+        memory-mapped rather than read into memory.
+        """
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in _ARRAY_FILES
+        }
+        with open(os.path.join(directory, "index.json"), "r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+        shape = (len(payload["vocabulary"]), len(payload["records"]))
+        matrix = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+        if mmap:
+            # scipy keeps plain ndarray views of the maps; hold the maps themselves
+            matrix.data, matrix.indices, matrix.indptr = arrays["data"], arrays["indices"], arrays["indptr"]
+        return cls(payload["records"], payload["vocabulary"], arrays["idf"], matrix)
+
+    def __len__(self) -> int:
+        return len(self.records)
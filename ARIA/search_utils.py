@@ -1,5 +1,11 @@
 # search_utils.py
 
+import re
+import threading
+from difflib import SequenceMatcher
+from collections import OrderedDict
+from .completion_cache import with_cache
+
 def build_search_query(term: str, extra: str = "") -> str:
     """
     Constructs a wildcard search query from a term.
@@ -22,7 +28,305 @@ def build_search_query(term: str, extra: str = "") -> str:
     return "*" + "* *".join(terms) + "*"
 
 
-def get_alternative_search_terms(client, search_term: str, extra_instructions: str = "") -> list[str]:
+def result_key(result):
+    """
+    Returns the (database, code) key of a search result, or None if the
+    result does not carry one (e.g. plain dictionaries).
+    """
+    key = getattr(result, "key", None)
+    if key is None and isinstance(result, dict):
+        key = result.get("key")
+    return tuple(key) if key else None
+
+
+def format_candidate(result) -> str:
+    """
+    Formats a candidate activity as "name, location, unit", the form in which
+    ChatGPT returns its recommendation.
+    """
+    return f"{result['name']}, {result['location']}, {result.get('unit', '')}"
+
+
+def format_candidates(results: list, numbered: bool = False) -> str:
+    """
+    Formats candidate activities as the list used in prompts, one
+    "- name, location, unit" line per candidate, or "1. name, location, unit"
+    lines if ``numbered`` is True.
+    """
+    if numbered:
+        return "".join(f"{number}. {format_candidate(result)}\n" for number, result in enumerate(results, start=1))
+    return "".join(f"- {format_candidate(result)}\n" for result in results)
+
+
+# Word and number tokens; hyphenated or dotted parts stay together ("16-32", "6-6", "2.5")
+_TOKEN = re.compile(r"\w+(?:[-./]\w+)*")
+
+# Highest confidence of names whose tokens differ, below any near-exact threshold
+_DIFFERENT_TOKENS_MAX = 0.9
+
+
+def match_confidence(activity_name: str, candidate_name: str) -> float:
+    """
+    Returns how confidently a candidate dataset name matches an activity name,
+    from 0 to 1.
+
+    Names made of the same word and number tokens, ignoring case, punctuation
+    and word order, score 1. Other names score their
+    ``difflib.SequenceMatcher`` similarity ratio, capped at 0.9: names that
+    differ in a single token (e.g. "EURO5" and "EURO6", or "nylon 6" and
+    "nylon 6-6") are usually different datasets, however similar they look.
+    """
+    activity = _TOKEN.findall(activity_name.lower())
+    candidate = _TOKEN.findall(candidate_name.lower())
+    if not activity or not candidate:
+        return 0.0
+    if sorted(activity) == sorted(candidate):
+        return 1.0
+    ratio = SequenceMatcher(None, " ".join(activity), " ".join(candidate)).ratio()
+    return min(ratio, _DIFFERENT_TOKENS_MAX)
+
+
+def best_match(activity_name: str, results: list) -> tuple:
+    """
+    Returns the candidate with the highest ``match_confidence`` (the first on
+    ties) and its confidence, or (None, 0.0) if there are no candidates.
+    """
+    best, confidence = None, 0.0
+    for result in results:
+        score = match_confidence(activity_name, result["name"])
+        if score > confidence:
+            best, confidence = result, score
+    return best, confidence
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def candidate_score(activity_name: str, candidate_name: str) -> float:
+    """
+    Lexical similarity of a candidate dataset name to an activity name.
+
+    The score is the share of the activity's words found in the candidate,
+    plus a bonus of 1 when the candidate contains the exact activity term, and
+    a small penalty for extra words, so shorter exact matches rank first.
+    """
+    activity_name = activity_name.lower().strip()
+    candidate_name = candidate_name.lower()
+    activity_words, candidate_words = _words(activity_name), _words(candidate_name)
+    if not activity_words or not candidate_words:
+        return 0.0
+    common = activity_words & candidate_words
+    score = len(common) / len(activity_words)
+    score += 0.1 * len(common) / len(activity_words | candidate_words)
+    if activity_name and activity_name in candidate_name:
+        score += 1.0
+    return score
+
+
+def rank_candidates(activity_name: str, results: list) -> list:
+    """
+    Applies the dataset selection rules in code and orders the candidates.
+
+    Candidates breaking a rule are removed (unless that would remove them all):
+    'waste' datasets for production activities, 'production' datasets for waste
+    activities, 'waste'/'treatment' datasets for activities that are not waste,
+    and 'electricity' datasets for activities that are not electricity. The rest
+    are ordered by ``candidate_score``, with 'treatment' datasets preferred for
+    waste activities and 'market group for electricity, medium voltage' for
+    electricity. Ties keep their search (location hierarchy) order.
+
+    Parameters
+    ----------
+    activity_name : str
+        The inventory activity being matched.
+    results : list
+        Candidate activities from the database search.
+
+    Returns
+    -------
+    list
+        The candidates, best first.
+    """
+    activity_name = activity_name.lower()
+    activity_words = _words(activity_name)
+
+    def allowed(name: str) -> bool:
+        words = _words(name)
+        if "production" in activity_words and "waste" in words:
+            return False
+        if "waste" in activity_words and "production" in words:
+            return False
+        if "waste" not in activity_words and ({"waste", "treatment"} & words):
+            return False
+        if "electricity" not in activity_words and "electricity" in words:
+            return False
+        return True
+
+    def score(result) -> float:
+        name = result["name"].lower()
+        value = candidate_score(activity_name, name)
+        if "waste" in activity_words and "treatment" in _words(name):
+            value += 0.25
+        if "electricity" in activity_words and "market group for electricity, medium voltage" in name:
+            value += 1.0
+        return value
+
+    kept = [result for result in results if allowed(result["name"])] or list(results)
+    return sorted(kept, key=score, reverse=True)
+
+
+def _search_by_location(db, query: str):
+    """
+    Runs one search grouped by location, as Brightway's Whoosh searcher
+    supports with ``facet="location"``: every hit, as a raw index document,
+    under its lowercased location. Returns None if ``db`` cannot search this
+    way or cannot fetch activities by code.
+    """
+    if not callable(getattr(db, "get", None)):
+        return None
+    try:
+        grouped = db.search(query, facet="location", proxy=False)
+    except TypeError:
+        return None
+    return grouped if isinstance(grouped, dict) else None
+
+
+def search_locations(db, query: str, locations: list, limit: int = 50) -> list:
+    """
+    Searches the database once for all requested locations.
+
+    Results are ordered by the position of their location in ``locations``,
+    which therefore acts as a fallback hierarchy (e.g. ["DE", "RER", "RoW",
+    "GLO"]); within a location, the search engine's relevance order is kept,
+    and duplicates are removed.
+
+    A Brightway database is searched with a single query grouped by location,
+    which returns every hit without any limit, so locations outside
+    ``locations`` cannot crowd out the requested ones; activities are only
+    loaded for the first ``limit`` hits of each requested location. Other
+    backends get a single unfiltered search with a limit of
+    ``limit * len(locations)``, and if it hits that limit, only the locations
+    it left short are searched again, with a filter.
+
+    Parameters
+    ----------
+    db : brightway2.Database
+        The database (or any object with a compatible ``search`` method).
+    query : str
+        The search query, e.g. built by ``build_search_query``.
+    locations : list of str
+        Location codes to keep, from most to least preferred.
+    limit : int, optional
+        Maximum number of results per location.
+
+    Returns
+    -------
+    list
+        The matching activities, most preferred location first.
+    """
+    rank = {location: position for position, location in enumerate(locations)}
+    grouped = _search_by_location(db, query)
+    if grouped is not None:
+        results, seen = [], set()
+        for location in locations:
+            codes = [document["code"] for document in grouped.get(location.lower(), [])]
+            for code in [code for code in dict.fromkeys(codes) if code not in seen][:limit]:
+                seen.add(code)
+                results.append(db.get(code))
+        return results
+
+    per_location = {location: 0 for location in locations}
+    seen = set()
+    results = []
+
+    def collect(found):
+        for result in found:
+            location = result["location"]
+            if location not in rank or per_location[location] >= limit:
+                continue
+            identity = result_key(result) or (result["name"], location, result.get("unit", ""))
+            if identity in seen:
+                continue
+            seen.add(identity)
+            per_location[location] += 1
+            results.append(result)
+
+    found = list(db.search(query, limit=limit * len(locations)))
+    collect(found)
+    if len(found) >= limit * len(locations):
+        for location in locations:
+            if per_location[location] < limit:
+                collect(db.search(query, limit=limit, filter={"location": location}))
+    results.sort(key=lambda result: rank[result["location"]])
+    return results
+
+
+def _copy_results(results):
+    if isinstance(results, dict):
+        return {group: list(hits) for group, hits in results.items()}
+    return list(results)
+
+
+class MemoizedSearch:
+    """
+    LRU memo around a database's ``search`` method.
+
+    Identical searches (same normalized query, filter and limit) are answered
+    from memory instead of going back to the search backend. One instance is
+    meant to be shared by every row of a run, so duplicate inventory lines and
+    repeated refined or alternative terms cost a single backend search.
+
+    Parameters
+    ----------
+    db : brightway2.Database
+        The database (or any object with a compatible ``search`` method).
+    maxsize : int, optional
+        Maximum number of memoized searches. Unlimited if None.
+    """
+
+    def __init__(self, db, maxsize: int = 4096):
+        self.db = db
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def search(self, query: str, limit: int = 50, filter: dict = None, **kwargs) -> list:
+        key = (
+            " ".join(query.lower().split()),
+            tuple(sorted((filter or {}).items())),
+            limit,
+            tuple(sorted(kwargs.items())),
+        )
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return _copy_results(self._results[key])
+            self.misses += 1
+        results = self.db.search(query, limit=limit, filter=filter, **kwargs)
+        # Faceted searches return {group: hits}, the others a list of hits
+        results = {group: list(hits) for group, hits in results.items()} if isinstance(results, dict) else list(results)
+        with self._lock:
+            self._results[key] = results
+            if self.maxsize is not None and len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return _copy_results(results)
+
+    def __getattr__(self, name):
+        # Anything else (e.g. Database.get) is the wrapped database's
+        if name == "db":
+            raise AttributeError(name)
+        return getattr(self.db, name)
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters and the number of memoized searches."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._results)}
+
+
+def get_alternative_search_terms(client, search_term: str, extra_instructions: str = "", cache=None) -> list[str]:
     """
     Uses the ChatGPT API to suggest alternative search terms.
     
@@ -38,11 +342,20 @@ def get_alternative_search_terms(client, search_term: str, extra_instructions: s
         The search term for which to generate alternative suggestions.
     extra_instructions : str, optional
         Additional instructions or context to refine the suggestions.
+    cache : CompletionCache, optional
+        If provided, the completion is looked up in (and stored to) this cache.
     
     Returns
     -------
     list[str]
-        A list of alternative search terms suggested by the ChatGPT API.
+        A list of alternative search terms suggested by the ChatGPT API, or an
+        empty list if the request fails.
+
+    Raises
+    ------
+    Exception
+        Transient API errors (rate limits, timeouts, server errors), which
+        ``RateLimitedClient`` retries, are raised rather than swallowed.
     """
     prompt = (
         f"Suggest a list of 3 alternative search terms that could be used to find similar datasets \n"
@@ -56,6 +369,7 @@ def get_alternative_search_terms(client, search_term: str, extra_instructions: s
     if extra_instructions:
         prompt += f" {extra_instructions}"
     
+    client = with_cache(client, cache)
     try:
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
@@ -71,5 +385,11 @@ def get_alternative_search_terms(client, search_term: str, extra_instructions: s
         suggestions = [s.strip() for s in suggestions_text.split(',')]
         return suggestions
     except Exception as e:
+        # Transient API failures (e.g. rate limits left after retries) are raised,
+        # so the row is not sent down the no-suggestions path because of them.
+        # Imported here: openai_client imports openai, which ARIA loads lazily.
+        from .openai_client import is_transient_error
+        if is_transient_error(e):
+            raise
         print("Error calling ChatGPT API:", e)
         return []
@@ -1,13 +1,439 @@
-from .search_utils import build_search_query, get_alternative_search_terms
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from .search_utils import (
+    build_search_query,
+    get_alternative_search_terms,
+    search_locations,
+    rank_candidates,
+    format_candidates,
+    format_candidate,
+    best_match,
+    result_key,
+    MemoizedSearch,
+)
+from .completion_cache import with_cache
+from .checkpoint import CheckpointJournal, row_identity
+from .instrumentation import instrument, span, bind_spans
+from .coalescing import MatchCoalescer, match_key
 import pandas as pd
 
+# Fields of a match record that describe the inventory row rather than its match
+_ROW_FIELDS = ("index", "activity", "notes", "row")
+
+# An answer made of a candidate number only, e.g. "2", "2.", "2)", "**2**", "Candidate 2"
+_CANDIDATE_NUMBER = re.compile(r"^\W*(?:(?:candidate|dataset|option|number|no)\W*)?(\d+)\W*$", re.IGNORECASE)
+# A numbered list entry, e.g. "2. market for copper, GLO, kg" or "2: market for copper"
+_NUMBERED_ENTRY = re.compile(r"^\W*(\d+)\s*[.):]\s+(.+)$")
+
+
+def _row_notes(row) -> str:
+    """
+    Returns the stripped 'Notes' entry of a row, or an empty string when the
+    column is missing or the cell is empty.
+    """
+    note_text = row.get("Notes", "")
+    if not isinstance(note_text, str):
+        return ""
+    return note_text.strip()
+
+
+def _refine_term(client, activity_name, note_text, verbose, metrics=None) -> str:
+    """
+    Asks ChatGPT for a two-word search term based on the activity name and its notes.
+    """
+    refined_prompt = (
+        f"Based on the activity name '{activity_name}' and these instructions: '{note_text}', /n"
+        f"provide a single refined search term of two words that best represents a dataset in the ecoinvent database."
+    )
+    with span(metrics, "refinement"):
+        refined_completion = client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": refined_prompt}],
+            temperature=0.7,
+            max_tokens=20
+        )
+    refined_term = refined_completion.choices[0].message.content.strip()
+    if verbose:
+        print("Refined term based on notes:", refined_term)
+    return refined_term
+
+
+def _cancel_searches(alternative) -> None:
+    """Cancels the searches of a finished alternatives request that have not started."""
+    if alternative.exception() is None:
+        for future in alternative.result()[1]:
+            future.cancel()
+
+
+def _speculative_fallback(activity_name, note_text, db, client, locations, verbose, executor, metrics=None) -> tuple:
+    """
+    Runs the refine and alternatives steps of ``_find_candidates`` at the same
+    time on ``executor``, and searches every alternative term in parallel as
+    soon as they arrive. The results are chosen in the sequential priority
+    order: refined term first, then the alternatives in the order ChatGPT
+    gave them.
+
+    Returns
+    -------
+    tuple
+        (search_results, refined_term, alternative_terms)
+    """
+    def search(term):
+        with span(metrics, "search"):
+            return search_locations(db, build_search_query(term), locations)
+
+    def refine():
+        refined_term = _refine_term(client, activity_name, note_text, verbose, metrics)
+        return refined_term, search(refined_term) if refined_term else []
+
+    def alternatives():
+        with span(metrics, "alternatives"):
+            alternative_terms = get_alternative_search_terms(client, activity_name, extra_instructions=note_text)
+        if verbose and alternative_terms:
+            print("ChatGPT suggested the following alternative search terms:", alternative_terms)
+        # Every term is searched as soon as the terms arrive, without waiting for the refined term
+        return alternative_terms, [executor.submit(bind_spans(metrics, search), term) for term in alternative_terms]
+
+    # Completions on the executor's threads count towards the row's spans
+    refined = executor.submit(bind_spans(metrics, refine)) if note_text else None
+    alternative = executor.submit(bind_spans(metrics, alternatives))
+    try:
+        # The refined term has priority, so a failed alternatives request does not matter if it hits
+        refined_term, refined_results = refined.result() if refined is not None else ("", [])
+        if refined_results:
+            if verbose:
+                print(f"Found {len(refined_results)} matches using the refined term '{refined_term}'.")
+            return refined_results, refined_term, []
+        alternative_terms, alternative_searches = alternative.result()
+        for alt_term, future in zip(alternative_terms, alternative_searches):
+            alternative_results = future.result()
+            if alternative_results:
+                if verbose:
+                    print(f"Found {len(alternative_results)} matching activities for alternative search term '{alt_term}'.")
+                return alternative_results, refined_term, alternative_terms
+        if verbose:
+            print("No matching datasets found even after trying ChatGPT suggestions.")
+        return [], refined_term, alternative_terms
+    finally:
+        # Lower-priority work not started yet is dropped, leaving the threads to other rows
+        if not alternative.cancel():
+            alternative.add_done_callback(_cancel_searches)
+
+
+def _find_candidates(index, activity_name, note_text, db, client, locations, verbose, top_k=None, metrics=None,
+                     executor=None) -> tuple:
+    """
+    Runs the search -> refine -> alternatives chain for a single inventory row,
+    then keeps the ``top_k`` candidates ranked by ``rank_candidates``. If an
+    ``executor`` is given, the fallback steps run concurrently on it (see
+    ``_speculative_fallback``).
+
+    Returns
+    -------
+    tuple
+        The list of candidate activities, and a dict with the candidates as a
+        bulleted string ('candidates', one per line) plus the 'refined_term'
+        and 'alternative_terms' requested from ChatGPT along the way.
+    """
+    refined_term = ""
+    alternative_terms = []
+    if verbose:
+        print(f"\nProcessing row {index + 1}: {activity_name}")
+    initial_query = build_search_query(activity_name)
+
+    # Search the database once for all locations.
+    with span(metrics, "search"):
+        search_results = search_locations(db, initial_query, locations)
+
+    if search_results:
+        if verbose:
+            print(f"Found {len(search_results)} matching activities for '{activity_name}'.")
+    elif executor is not None:
+        if verbose:
+            print(f"No matching activities found for '{activity_name}'.")
+        search_results, refined_term, alternative_terms = _speculative_fallback(
+            activity_name, note_text, db, client, locations, verbose, executor, metrics
+        )
+    else:
+        if verbose:
+            print(f"No matching activities found for '{activity_name}'.")
+        # -----------------------
+        # Step 1: If notes exist, try generating a refined term.
+        if note_text:
+            refined_term = _refine_term(client, activity_name, note_text, verbose, metrics)
+            if refined_term:
+                refined_query = build_search_query(refined_term)
+                with span(metrics, "search"):
+                    refined_results = search_locations(db, refined_query, locations)
+                if refined_results:
+                    if verbose:
+                        print(f"Found {len(refined_results)} matches using the refined term '{refined_term}'.")
+                    search_results = refined_results
+
+        # -----------------------
+        # Step 2: If still no matches, ask ChatGPT for alternative search terms.
+        if not search_results:
+            with span(metrics, "alternatives"):
+                alternative_terms = get_alternative_search_terms(client, activity_name, extra_instructions=note_text)
+            if alternative_terms:
+                if verbose:
+                    print("ChatGPT suggested the following alternative search terms:", alternative_terms)
+                found_alternative = False
+                for alt_term in alternative_terms:
+                    revised_query = build_search_query(alt_term)
+                    with span(metrics, "search"):
+                        alternative_results = search_locations(db, revised_query, locations)
+                    if alternative_results:
+                        if verbose:
+                            print(f"Found {len(alternative_results)} matching activities for alternative search term '{alt_term}'.")
+                        found_alternative = True
+                        search_results = alternative_results
+                        break
+                if not found_alternative and verbose:
+                    print("No matching datasets found even after trying ChatGPT suggestions.")
+            else:
+                if verbose:
+                    print("No alternative search term suggestions were received from ChatGPT.")
+
+    # -----------------------
+    # Apply the selection rules in code and keep only the best candidates for the prompt.
+    if top_k:
+        search_results = rank_candidates(activity_name, search_results)[:top_k]
+    results_string = format_candidates(search_results, numbered=True)
+    if verbose and results_string:
+        print(results_string)
+
+    details = {
+        "candidates": results_string,
+        "refined_term": refined_term,
+        "alternative_terms": alternative_terms,
+    }
+    return search_results, details
+
+
+def _resolve_selection(answer: str, candidates: list) -> tuple:
+    """
+    Maps ChatGPT's answer to the candidate it names.
+
+    The answer is expected to be a candidate number, possibly decorated (e.g.
+    "3", "3.", "3)", "**3**" or "Candidate 3"). A number followed by text is
+    only taken as a list entry ("3. name, GLO, kg") when the text names that
+    candidate, so names starting with a number ("1-propanol production, RER,
+    kg") are never read as one. A candidate written out as "name, location,
+    unit" is also recognised, and takes precedence.
+
+    Returns
+    -------
+    tuple
+        The selection as "name, location, unit" and the activity key of the
+        chosen candidate, or the answer as given and None if it names no
+        candidate.
+    """
+    answer = str(answer).strip()
+    text = answer.lstrip("- ").strip().lower()
+    for candidate in candidates:
+        if format_candidate(candidate).lower() == text:
+            return format_candidate(candidate), result_key(candidate)
+    number = _CANDIDATE_NUMBER.match(answer)
+    if number and 1 <= int(number.group(1)) <= len(candidates):
+        candidate = candidates[int(number.group(1)) - 1]
+        return format_candidate(candidate), result_key(candidate)
+    entry = _NUMBERED_ENTRY.match(answer)
+    if entry and 1 <= int(entry.group(1)) <= len(candidates):
+        candidate = candidates[int(entry.group(1)) - 1]
+        if entry.group(2).strip().lower().startswith(str(candidate.get("name", "")).lower()):
+            return format_candidate(candidate), result_key(candidate)
+    return answer, None
+
+
+def _select_dataset(client, activity_name, candidates, user_message, verbose) -> tuple:
+    """
+    Asks ChatGPT to choose one dataset for a row from its numbered candidates.
+
+    Returns
+    -------
+    tuple
+        The selection and its activity key (see ``_resolve_selection``), or
+        an empty selection and None if there are no candidates, in which
+        case no request is made.
+    """
+    if not candidates:
+        return "", None
+    results_string = format_candidates(candidates, numbered=True)
+    # Build the complete prompt for ChatGPT using the (possibly refined) candidates.
+    prompt_content = (
+        f"Given the user instructions: '{user_message}', help choose one dataset to be used for '{activity_name}' from the Ecoinvent database. Follow these rules:\n"
+        f"related to '{activity_name}'.\n"
+        f"Choose one dataset to be used for '{activity_name}' under the following rules:\n"
+        f"1. If they exist, give highest preference to datasets that include the exact term '{activity_name}'.\n"
+        f"2. Answer only with the number of the recommended dataset in the numbered list below (no extra text).\n"
+        f"3. Always give preference to datasets that match the exact terms in '{activity_name}'.\n"
+        f"4. If '{activity_name}' includes 'production', do not choose a dataset that includes 'waste'.\n"
+        f"5. If '{activity_name}' includes 'waste', do not choose a dataset that includes 'production'; prefer 'treatment'.\n"
+        f"6. If '{activity_name}' includes 'electricity', prefer datasets that include the exact term 'market group for electricity, medium voltage'.\n"
+        f"7. Only print the number of the dataset, without any extra text.\n"
+        f"8. If '{activity_name}' does not include the term 'waste', never choose a dataset that includes this term or 'treatment'.\n"
+        f"9. If '{activity_name}' does not include the term 'electricity', never choose a dataset that includes the exact term 'electricity'.\n\n"
+        f"Candidates:\n{results_string}"
+    )
+
+    # Ask ChatGPT to choose which dataset to use based on the prompt.
+    chat_completion = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "user", "content": prompt_content}
+        ],
+        temperature=0.7,
+        max_tokens=5
+    )
+    response_content = chat_completion.choices[0].message.content.strip()
+    if verbose:
+        print("ChatGPT Response:")
+        print(response_content)
+    return _resolve_selection(response_content, candidates)
+
+
+def _select_dataset_batch(client, items, user_message, verbose) -> list[tuple]:
+    """
+    Asks ChatGPT to choose one dataset for each of several rows in a single
+    request. The selection rules are stated once for the whole batch.
+
+    Parameters
+    ----------
+    items : list of tuple
+        (activity_name, candidates) pairs, one per row.
+
+    Returns
+    -------
+    list[tuple]
+        The recommended dataset and its activity key for each row, in the order
+        of ``items``. Rows the model did not answer are resolved with a
+        single-row request.
+    """
+    # Rows without candidates have nothing to choose from and are left out of the request.
+    asked = [(activity_name, candidates) for activity_name, candidates in items if candidates]
+    if not asked:
+        return [("", None) for _ in items]
+    rows_text = ""
+    for number, (activity_name, candidates) in enumerate(asked, start=1):
+        rows_text += f"Row {number}: '{activity_name}'\nCandidates:\n{format_candidates(candidates, numbered=True)}\n"
+
+    prompt_content = (
+        f"Given the user instructions: '{user_message}', help choose one dataset from the Ecoinvent database for each of the {len(asked)} activities below.\n"
+        f"Apply these rules to every row separately, using only that row's candidates:\n"
+        f"1. If they exist, give highest preference to datasets that include the exact activity term.\n"
+        f"2. Always give preference to datasets that match the exact terms in the activity.\n"
+        f"3. If the activity includes 'production', do not choose a dataset that includes 'waste'.\n"
+        f"4. If the activity includes 'waste', do not choose a dataset that includes 'production'; prefer 'treatment'.\n"
+        f"5. If the activity includes 'electricity', prefer datasets that include the exact term 'market group for electricity, medium voltage'.\n"
+        f"6. If the activity does not include the term 'waste', never choose a dataset that includes this term or 'treatment'.\n"
+        f"7. If the activity does not include the term 'electricity', never choose a dataset that includes the exact term 'electricity'.\n"
+        f"8. Answer with a JSON object only, mapping each row number to the number of the candidate you chose "
+        f"in that row's list, without any extra text, e.g. {{\"1\": 2, \"2\": 1}}.\n\n"
+        f"{rows_text}"
+    )
+
+    chat_completion = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "user", "content": prompt_content}
+        ],
+        temperature=0.7,
+        max_tokens=10 * len(asked)
+    )
+    response_content = chat_completion.choices[0].message.content.strip()
+    if verbose:
+        print("ChatGPT batch response:")
+        print(response_content)
+
+    answers = _parse_batch_selection(response_content)
+    selections = []
+    number = 0
+    for activity_name, candidates in items:
+        if not candidates:
+            selections.append(("", None))
+            continue
+        number += 1
+        answer = answers.get(str(number))
+        if not answer:
+            if verbose:
+                print(f"No batch answer for '{activity_name}'; selecting it on its own.")
+            selections.append(_select_dataset(client, activity_name, candidates, user_message, verbose))
+        else:
+            selections.append(_resolve_selection(answer, candidates))
+    return selections
+
+
+def _parse_batch_selection(text: str) -> dict:
+    """
+    Extracts the {row number: dataset} JSON object from a batch response,
+    tolerating code fences or text around it. Returns an empty dict if the
+    response cannot be parsed.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        answers = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(answers, dict):
+        return {}
+    return {str(k).strip(): str(v).strip() for k, v in answers.items() if v}
+
+
+def _map(func, items, max_workers):
+    """
+    Applies ``func`` to every item, in a thread pool when max_workers > 1,
+    and returns the results in the order of ``items``.
+    """
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(func, items))
+    return [func(item) for item in items]
+
+
+def _completed(func, items, max_workers):
+    """
+    Applies ``func`` to every item and yields the results as they finish:
+    in completion order from a thread pool when max_workers > 1, in the
+    order of ``items`` otherwise. Pending work is cancelled if the consumer
+    stops early.
+    """
+    if max_workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [executor.submit(func, item) for item in items]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
 def process_dataframe(
     data_frame, 
     db, 
     client, 
     user_message="", 
     locations=None,
-    verbose=False
+    verbose=False,
+    cache=None,
+    max_workers=1,
+    batch_size=None,
+    search_memo=None,
+    checkpoint_path=None,
+    resume=True,
+    top_k=10,
+    fast_path_threshold=0.95,
+    metrics=None,
+    coalescer=None,
+    speculative=False,
+    match_memory=None
 ):
     """
     Loop over rows in the data_frame, search the Ecoinvent database,
@@ -20,164 +446,308 @@ def process_dataframe(
         A DataFrame that must have at least one column 'Input/output'
         for the activity name. Optionally, it may include a 'Notes' column.
     db : brightway2.Database
-        The Ecoinvent database object or equivalent for searching.
+        The Ecoinvent database object or equivalent for searching, e.g. an
+        ActivityRetrievalIndex built from it for faster, fuzzier searches.
     client : Any
         An OpenAI-like client that can make chat completion calls 
         (e.g., openai with an API key set).
     user_message : str, optional
         Additional instructions provided by the user for refining dataset selection.
     locations : list of str, optional
-        A list of location codes to filter when searching the database.
-        Defaults to ["GLO", "RoW"] if not provided.
+        A list of location codes to filter when searching the database, from
+        most to least preferred (e.g. country -> region -> RoW -> GLO). Each
+        query is a single search covering all of them, and candidates are
+        listed in this order. Defaults to ["GLO", "RoW"] if not provided.
     verbose : bool, optional
         If True, prints detailed intermediate output; if False, suppresses
         intermediate printing.
+    cache : CompletionCache, optional
+        If provided, every chat completion of the run is answered from this
+        cache when possible, so re-running an unchanged inventory makes no
+        API calls.
+    max_workers : int, optional
+        Number of rows processed concurrently in a thread pool. Each row spends
+        most of its time waiting on database searches and API round-trips, so
+        values above 1 shorten the run roughly in proportion until the API
+        rate limit is reached. Defaults to 1 (rows are processed in order).
+    batch_size : int, optional
+        If given, the final dataset selection is made for this many rows per
+        chat completion instead of one request per row. The selection rules
+        are sent once per batch, which cuts requests and prompt tokens on
+        large inventories.
+    search_memo : MemoizedSearch, optional
+        Memo wrapping ``db`` whose searches are reused across rows. A new one
+        is created for every run if not provided; pass one explicitly to share
+        it between runs or to read its ``stats()`` afterwards.
+    checkpoint_path : str, optional
+        Path of a JSONL journal to which every row's candidates, refined and
+        alternative terms and selection are appended as soon as it completes.
+    resume : bool, optional
+        If True (default) and the journal exists, rows already recorded in it
+        are taken from it instead of being searched and selected again, so an
+        interrupted run only pays for the remaining rows. A journal written
+        with another user message, other locations or another database raises
+        a ValueError. If False, the journal is started afresh.
+    top_k : int, optional
+        Number of candidates sent to ChatGPT for each row. Candidates are first
+        filtered and ranked in code with the same rules the prompt states
+        (see ``rank_candidates``). Defaults to 10; None sends every candidate.
+    fast_path_threshold : float, optional
+        If the best candidate's ``match_confidence`` with the activity name
+        reaches this value, it is selected directly without a chat completion.
+        Only names with the same words and numbers (in any order) score above
+        0.9, so the default of 0.95 never takes a look-alike dataset such as
+        another EURO class or size class; None always asks ChatGPT.
+    metrics : MetricsCollector, optional
+        If provided, the searches, refinements, alternative-term requests and
+        selections of every row are timed, and every chat completion is
+        counted with its token usage (see ``MetricsCollector.summary``).
+    coalescer : MatchCoalescer, optional
+        Shares matches between rows with the same activity name, notes, user
+        message and locations, so duplicate rows (including rows processed
+        concurrently) cost a single search and selection. A new one is created
+        for every run if not provided; pass one explicitly to share matches
+        between runs.
+    speculative : bool, optional
+        If True, when the first search finds nothing, the refined-term and
+        alternative-term requests are sent at the same time and all alternative
+        terms are searched in parallel. The result is chosen in the same
+        priority order as the sequential fallback, so a hard-to-match row costs
+        about one round-trip and one search instead of several in a row, at the
+        price of requests whose answers may go unused. Defaults to False.
+    match_memory : MatchMemory, optional
+        Store of curated matches for the database release being searched.
+        Rows with an approved match for their activity name, notes and
+        locations take it directly, before any search or chat completion.
 
     Returns
     -------
     pd.DataFrame
         The updated DataFrame with ChatGPT recommendations in the 
-        'Ecoinvent process' column.
+        'Ecoinvent process' column, and the Brightway key of each recommended
+        activity in the 'Activity key' column (None where the answer named no
+        candidate). ``run_impact_assessment`` uses the keys directly. The
+        'Match path' column tells how each row was selected: 'memory',
+        'fast_path' or 'llm' (see ``iter_process_dataframe``), so rows picked
+        without ChatGPT can be audited.
+    """
+    if search_memo is None:
+        search_memo = MemoizedSearch(db)
+    if coalescer is None:
+        coalescer = MatchCoalescer()
+
+    records = iter_process_dataframe(
+        data_frame, db, client, user_message=user_message, locations=locations,
+        verbose=verbose, cache=cache, max_workers=max_workers, batch_size=batch_size,
+        search_memo=search_memo, checkpoint_path=checkpoint_path, resume=resume, top_k=top_k,
+        fast_path_threshold=fast_path_threshold, metrics=metrics, coalescer=coalescer,
+        speculative=speculative, match_memory=match_memory,
+    )
+    # Rows may finish in any order; each result is written to its own row.
+    activity_keys, paths = {}, {}
+    for record in records:
+        data_frame.at[record["index"], "Ecoinvent process"] = record["selection"]
+        activity_keys[record["index"]] = record.get("activity_key")
+        paths[record["index"]] = record.get("path")
+    data_frame["Activity key"] = pd.Series(activity_keys, index=data_frame.index, dtype=object)
+    data_frame["Match path"] = pd.Series(paths, index=data_frame.index, dtype=object)
+
+    if verbose:
+        print("Database search memo:", search_memo.stats())
+        print("Shared matches:", coalescer.stats())
+        if match_memory is not None:
+            print("Curated matches:", match_memory.stats())
+
+    return data_frame
+
+
+def iter_process_dataframe(
+    data_frame,
+    db,
+    client,
+    user_message="",
+    locations=None,
+    verbose=False,
+    cache=None,
+    max_workers=1,
+    batch_size=None,
+    search_memo=None,
+    checkpoint_path=None,
+    resume=True,
+    top_k=10,
+    fast_path_threshold=0.95,
+    metrics=None,
+    coalescer=None,
+    speculative=False,
+    match_memory=None
+):
+    """
+    Streaming variant of ``process_dataframe``: yields one match record per
+    row as soon as that row is resolved, without modifying ``data_frame``.
+
+    Takes the same parameters as ``process_dataframe``. With max_workers > 1
+    records arrive in completion order; in batch mode, all records of a batch
+    arrive together. A downstream stage (e.g. ``iter_impact_assessment``) can
+    consume the records while later rows are still being matched.
+
+    Yields
+    ------
+    dict
+        'index' (the row label), 'activity', 'notes', 'row' (the row's
+        values), 'candidates', 'refined_term', 'alternative_terms', the
+        recommended dataset in 'selection' with its Brightway key in
+        'activity_key' (None if the answer named no candidate), and in 'path'
+        how it was selected: 'memory' (a curated match), 'fast_path' (with
+        its 'confidence') or 'llm'.
     """
     if locations is None:
         locations = ["GLO", "RoW"]
+    client = with_cache(instrument(client, metrics), cache)
+    if search_memo is None:
+        search_memo = MemoizedSearch(db)
+    db = search_memo
+    if coalescer is None:
+        coalescer = MatchCoalescer()
 
-    for index, row in data_frame.iterrows():
-        activity_name = row["Input/output"].strip().lower()
-        if verbose:
-            print(f"\nProcessing row {index + 1}: {activity_name}")
-        initial_query = build_search_query(activity_name)
-        
-        # Search the database for each location.
-        search_results = []
-        for location in locations:
-            search_results.extend(
-                db.search(initial_query, limit=50, filter={"location": location})
-            )
+    rows = [
+        {
+            "index": index,
+            "activity": row["Input/output"].strip().lower(),
+            "notes": _row_notes(row),
+            "row": row.to_dict(),
+        }
+        for index, row in data_frame.iterrows()
+    ]
 
-        results_string = ""
-        if search_results:
-            if verbose:
-                print(f"Found {len(search_results)} matching activities for '{activity_name}':")
-            for result in search_results:
-                results_string += f"- {result['name']}, {result['location']}, {result.get('unit', '')}\n"
-            if verbose:
-                print(results_string)
-        else:
-            if verbose:
-                print(f"No matching activities found for '{activity_name}'.")
-            # -----------------------
-            # Step 1: If notes exist, try generating a refined term.
-            refined_term = ""
-            if "Notes" in data_frame.columns:
-                note_text = row.get("Notes", "").strip()
-                if note_text:
-                    refined_prompt = (
-                        f"Based on the activity name '{activity_name}' and these instructions: '{note_text}', /n"
-                        f"provide a single refined search term of two words that best represents a dataset in the ecoinvent database."
-                    )
-                    refined_completion = client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[{"role": "user", "content": refined_prompt}],
-                        temperature=0.7,
-                        max_tokens=20
+    def find(row):
+        search_results, details = _find_candidates(
+            row["index"], row["activity"], row["notes"], db, client, locations, verbose, top_k, metrics,
+            fallback_executor,
+        )
+        record = {**row, **details}
+        # Select near-exact name matches directly, without asking ChatGPT.
+        if fast_path_threshold is not None:
+            best, confidence = best_match(row["activity"], search_results)
+            if best is not None and confidence >= fast_path_threshold:
+                record.update(
+                    selection=format_candidate(best), activity_key=result_key(best),
+                    path="fast_path", confidence=confidence,
+                )
+                if verbose:
+                    print(f"Selected '{record['selection']}' without ChatGPT (confidence {confidence:.2f}).")
+        return record, search_results
+
+    def key_of(row):
+        return match_key(row["activity"], row["notes"], user_message, locations)
+
+    def match_fields(record):
+        return {field: value for field, value in record.items() if field not in _ROW_FIELDS}
+
+    def match(row):
+        def execute():
+            record, candidates = find(row)
+            if "selection" not in record:
+                with span(metrics, "selection"):
+                    record["selection"], record["activity_key"] = _select_dataset(
+                        client, record["activity"], candidates, user_message, verbose
                     )
-                    refined_term = refined_completion.choices[0].message.content.strip()
-                    if verbose:
-                        print("Refined term based on notes:", refined_term)
-                    if refined_term:
-                        refined_query = build_search_query(refined_term)
-                        refined_results = []
-                        for location in locations:
-                            refined_results.extend(
-                                db.search(refined_query, limit=50, filter={"location": location})
-                            )
-                        if refined_results:
-                            if verbose:
-                                print(f"Found {len(refined_results)} matches using the refined term '{refined_term}'.")
-                            search_results = refined_results
-                            # Update results_string based on refined_results.
-                            results_string = ""
-                            for result in refined_results:
-                                results_string += f"- {result['name']}, {result['location']}, {result.get('unit', '')}\n"
-            
-            # -----------------------
-            # Step 2: If still no matches, ask ChatGPT for alternative search terms.
-            if not search_results:
-                extra_instructions = ""
-                if "Notes" in data_frame.columns:
-                    note_text = row.get("Notes", "").strip()
-                    if note_text:
-                        extra_instructions = note_text
-                
-                alternative_terms = get_alternative_search_terms(client, activity_name, extra_instructions=extra_instructions)
-                if alternative_terms:
-                    if verbose:
-                        print("ChatGPT suggested the following alternative search terms:", alternative_terms)
-                    found_alternative = False
-                    for alt_term in alternative_terms:
-                        revised_query = build_search_query(alt_term)
-                        alternative_results = []
-                        for location in locations:
-                            alternative_results.extend(
-                                db.search(revised_query, limit=50, filter={"location": location})
-                            )
-                        if alternative_results:
-                            if verbose:
-                                print(f"Found {len(alternative_results)} matching activities for alternative search term '{alt_term}':")
-                            results_string = ""
-                            for result in alternative_results:
-                                results_string += f"- {result['name']}, {result['location']}\n"
-                            if verbose:
-                                print(results_string)
-                            found_alternative = True
-                            search_results = alternative_results
-                            break
-                    if not found_alternative and verbose:
-                        print("No matching datasets found even after trying ChatGPT suggestions.")
-                else:
-                    if verbose:
-                        print("No alternative search term suggestions were received from ChatGPT.")
+                record["path"] = "llm"
+            return match_fields(record)
 
-        # -----------------------
-        # Build the complete prompt for ChatGPT using the (possibly refined) results_string.
-        prompt_content = (
-            f"Given the user instructions: '{user_message}', help choose one dataset to be used for '{activity_name}' from the Ecoinvent database. Follow these rules:\n"
-            f"related to '{activity_name}'.\n"
-            f"Choose one dataset to be used for '{activity_name}' under the following rules:\n"
-            f"1. If they exist, give highest preference to datasets that include the exact term '{activity_name}'.\n"
-            f"2. Print only the exact name of the recommended dataset as shown in '{results_string}' (no extra text).\n"
-            f"3. Always give preference to datasets that match the exact terms in '{activity_name}'.\n"
-            f"4. If '{activity_name}' includes 'production', do not choose a dataset that includes 'waste'.\n"
-            f"5. If '{activity_name}' includes 'waste', do not choose a dataset that includes 'production'; prefer 'treatment'.\n"
-            f"6. If '{activity_name}' includes 'electricity', prefer datasets that include the exact term 'market group for electricity, medium voltage'.\n"
-            f"7. Only print the name of the dataset as it was found in Ecoinvent, without any extra text.\n"
-            f"8. If '{activity_name}' does not include the term 'waste', never choose a dataset that includes this term or 'treatment'.\n"
-            f"9. If '{activity_name}' does not include the term 'electricity', never choose a dataset that includes the exact term 'electricity'.\n"
-        )
+        with span(metrics, "row", index=row["index"]):
+            return {**row, **coalescer.run(key_of(row), execute)}
 
+    def match_batch(batch):
+        items = [(record["activity"], candidates) for record, candidates in batch]
+        with span(metrics, "selection", rows=len(batch)):
+            selections = _select_dataset_batch(client, items, user_message, verbose)
+        return [
+            {**record, "selection": selection, "activity_key": key, "path": "llm"}
+            for (record, _), (selection, key) in zip(batch, selections)
+        ]
 
-        # Ask ChatGPT to choose which dataset to use based on the prompt.
-        chat_completion = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "user", "content": prompt_content}
-            ],
-            temperature=0.7,
-            max_tokens=50
-        )
-        response_content = chat_completion.choices[0].message.content.strip()
-        if verbose:
-            print("ChatGPT Response:")
-            print(response_content)
-        data_frame.at[index, "Ecoinvent process"] = response_content
+    # Replay rows already recorded in the checkpoint journal and only work on the rest.
+    journal = None
+    if checkpoint_path:
+        run = {"user_message": user_message, "locations": list(locations), "database": getattr(db, "name", None)}
+        journal = CheckpointJournal(checkpoint_path, run=run)
+        if not resume:
+            journal.clear()
+        done = journal.load()
+        pending = []
+        for row in rows:
+            record = done.get(row_identity(row))
+            if record is None:
+                pending.append(row)
+            else:
+                if verbose:
+                    print(f"Resuming row {row['index'] + 1} from checkpoint: {row['activity']}")
+                activity_key = record.get("activity_key")
+                yield {
+                    **record, "index": row["index"], "row": row["row"],
+                    "activity_key": tuple(activity_key) if activity_key else None,
+                }
+        rows = pending
+
+    # Rows with a curated match are resolved before any search.
+    remembered = []
+    if match_memory is not None:
+        pending = []
+        for row in rows:
+            fields = match_memory.get(row["activity"], row["notes"], locations)
+            if fields is None:
+                pending.append(row)
+            else:
+                if verbose:
+                    print(f"Row {row['index'] + 1} has a curated match: {fields['selection']}")
+                remembered.append({
+                    **row, "candidates": "", "refined_term": "", "alternative_terms": [], **fields, "path": "memory",
+                })
+        rows = pending
 
+    # One executor serves the speculative fallbacks of every row of the run
+    fallback_executor = None
+    if speculative:
+        fallback_executor = ThreadPoolExecutor(max_workers=8 * max(max_workers, 1), thread_name_prefix="aria-fallback")
+    try:
+        if batch_size:
+            # Rows with an already matched key are served at once; of the others,
+            # one row per key is worked on and its match is shared with the rest.
+            served, groups = [], {}
+            for row in rows:
+                fields = coalescer.get(key_of(row))
+                if fields is not None:
+                    served.append({**row, **fields})
+                else:
+                    groups.setdefault(key_of(row), []).append(row)
 
+            def fan_out(records):
+                for record in records:
+                    key = key_of(record)
+                    coalescer.put(key, match_fields(record))
+                    yield record
+                    for row in groups[key][1:]:
+                        yield {**row, **coalescer.get(key)}
 
-  #  if verbose:
-  #      print(f"\nARIA refined {refined_count} datasets. Final results:")
-  #      print(data_frame.to_string(index=False))
-    
-    return data_frame
+            # Gather every key's candidates first, then select in batches.
+            found = _map(find, [group[0] for group in groups.values()], max_workers)
+            selected = [record for record, _ in found if "selection" in record]
+            remaining = [(record, candidates) for record, candidates in found if "selection" not in record]
+            batches = [remaining[start:start + batch_size] for start in range(0, len(remaining), batch_size)]
+            stream = chain(
+                remembered,
+                served,
+                fan_out(selected),
+                fan_out(record for records in _completed(match_batch, batches, max_workers) for record in records),
+            )
+        else:
+            stream = chain(remembered, _completed(match, rows, max_workers))
 
-    
+        for record in stream:
+            if journal is not None:
+                journal.append(record)
+            yield record
+    finally:
+        if fallback_executor is not None:
+            # Lower-priority searches still running are not waited for
+            fallback_executor.shutdown(wait=False, cancel_futures=True)
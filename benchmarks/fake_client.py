@@ -0,0 +1,84 @@
+# fake_client.py
+
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeAPIError(Exception):
+    """A simulated API failure, carrying an HTTP ``status_code`` like the OpenAI errors."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Simulated API error {status_code}")
+        self.status_code = status_code
+
+
+class FakeChatClient:
+    """
+    Offline stand-in for the OpenAI client, answering the prompts of the
+    search workflow without any network access.
+
+    Selections pick candidate number 1 of each row, refinements return the
+    first two words of the activity, and alternative terms return its words.
+    Every request sleeps for ``latency`` seconds (+/- ``jitter``), fails with
+    probability ``failure_rate`` (as a 429 or 500 ``FakeAPIError``) and
+    reports a token usage estimated from the prompt length.
+
+    Parameters
+    ----------
+    latency : float, optional
+        Mean simulated round-trip time in seconds.
+    jitter : float, optional
+        Maximum deviation from ``latency``, in seconds.
+    failure_rate : float, optional
+        Share of requests that fail.
+    seed : int, optional
+        Seed of the latency and failure draws.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        with self._lock:
+            self.calls += 1
+            delay = max(self.latency + self._rng.uniform(-self.jitter, self.jitter), 0.0)
+            failed = self._rng.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        time.sleep(delay)
+        if failed:
+            raise FakeAPIError(self._rng.choice([429, 500]))
+
+        content = self._answer(prompt)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=max(len(content) // 4, 1)),
+        )
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        if "Row 1:" in prompt:
+            answers = {}
+            for number, block in re.findall(r"Row (\d+): '.*?'\nCandidates:\n(.*?)(?=\nRow \d+: |\Z)", prompt, re.S):
+                if re.search(r"^1\. ", block, re.M):
+                    answers[number] = 1
+            return json.dumps(answers)
+        if re.search(r"^1\. ", prompt, re.M):
+            return "1"
+        activity = re.search(r"'([^']*)'", prompt)
+        words = activity.group(1).split() if activity else ["material"]
+        if "refined search term" in prompt:
+            return " ".join(words[:2])
+        return ", ".join(words[:3])
@@ -0,0 +1,202 @@
+# run_benchmarks.py
+
+"""
+Benchmarks the ARIA pipeline on a synthetic ecoinvent-scale database.
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.run_benchmarks --sizes 10 100 500 --output results.json
+    python -m benchmarks.run_benchmarks --output new.json --baseline results.json
+
+Each stage (matching with ``process_dataframe``, ``run_impact_assessment``
+and ``plot_lcia_waterfall_charts``) is timed on its own at every inventory
+size, then run again under ``tracemalloc`` to measure its peak memory, so the
+tracing overhead does not distort the timings. With ``--processes``, the unit
+scores of as many activities as the inventory has rows are also solved with
+each of the given worker counts, to show where the process pool pays off.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from unittest import mock
+import pandas as pd
+import plotly.graph_objects as go
+from ARIA import __version__, activity_index
+from ARIA.search_workflow import process_dataframe
+from ARIA.ecoinvent_processing import process_ecoinvent_dataframe
+from ARIA.impact_assessment import run_impact_assessment
+from ARIA.lca_engine import LCAEngine
+from ARIA.plot_lcia import plot_lcia_waterfall_charts
+from ARIA.instrumentation import MetricsCollector
+from ARIA.openai_client import RateLimitedClient
+from .synthetic import DATABASE_NAME, METHODS, synthetic_brightway, make_inventory
+from .fake_client import FakeChatClient
+
+
+def _measure(func, memory: bool) -> tuple:
+    """Runs ``func`` and returns (result, seconds, peak MiB or None), silencing its prints."""
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+    finally:
+        seconds = time.perf_counter() - start
+        peak = None
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def benchmark_size(database, rows: int, args) -> list:
+    """Benchmarks every stage on one inventory of ``rows`` rows."""
+    inventory = make_inventory(database, rows, exact_share=args.exact_share, seed=args.seed)
+    results = []
+
+    def record(stage, seconds, peak, **extra):
+        results.append({
+            "benchmark": stage,
+            "rows": rows,
+            "seconds": seconds,
+            "rows_per_s": rows / seconds if seconds else None,
+            "peak_mib": peak,
+            **extra,
+        })
+
+    # 1) Matching: latency-bound, so timed with the configured client
+    def match(client, metrics=None):
+        return process_dataframe(
+            inventory.copy(), database, client, locations=args.locations,
+            max_workers=args.max_workers, batch_size=args.batch_size, metrics=metrics,
+        )
+
+    client, metrics = FakeChatClient(args.latency, args.jitter, args.failure_rate, args.seed), MetricsCollector()
+    limited = client
+    if args.requests_per_minute or args.retries:
+        limited = RateLimitedClient(
+            client, requests_per_minute=args.requests_per_minute, max_retries=args.retries, backoff_base=0.05
+        )
+    try:
+        matched, seconds, _ = _measure(lambda: match(limited, metrics), memory=False)
+        error = None
+    except Exception as error_:  # a simulated API failure ends the run, as it would in production
+        matched, seconds, error = None, None, repr(error_)
+    _, _, peak = _measure(lambda: match(FakeChatClient(latency=0.0)), memory=True)
+    # Completions are counted in every open span, so only the innermost stages are summed
+    summary = metrics.summary().set_index("stage")
+    leaf_stages = summary.index.intersection(["refinement", "alternatives", "selection", "chat_completion"])
+    record(
+        "process_dataframe", seconds, peak, chat_calls=client.calls, failures=client.failures,
+        prompt_tokens=int(summary.loc[leaf_stages, "prompt_tokens"].sum()), error=error,
+    )
+    if matched is None:
+        matched = match(FakeChatClient(latency=0.0))
+
+    # 2) Impact assessment: CPU-bound, timed including the activity index build and the LCA
+    processed = process_ecoinvent_dataframe(matched)
+
+    def assess():
+        activity_index._INDEX_CACHE.clear()
+        return run_impact_assessment(processed.copy(), METHODS, ecoinvent_db_name=DATABASE_NAME)
+
+    assessed, seconds, _ = _measure(assess, memory=False)
+    _, _, peak = _measure(assess, memory=True)
+    record("run_impact_assessment", seconds, peak)
+
+    # 3) Plotting: figures are built but not shown
+    with mock.patch.object(go.Figure, "show"):
+        _, seconds, _ = _measure(lambda: plot_lcia_waterfall_charts(assessed), memory=False)
+        _, _, peak = _measure(lambda: plot_lcia_waterfall_charts(assessed), memory=True)
+    record("plot_lcia_waterfall_charts", seconds, peak)
+
+    # 4) Unit scores per worker count: tracemalloc does not see the workers, so only timed
+    if args.processes:
+        sample = random.Random(args.seed).sample(database.activities, min(rows, len(database.activities)))
+        keys = [activity.key for activity in sample]
+        for processes in args.processes:
+            engine = LCAEngine(keys, METHODS)
+            _, seconds, _ = _measure(lambda: engine.unit_score_matrix(keys, processes=processes), memory=False)
+            record("unit_score_matrix", seconds, None, processes=processes)
+    return results
+
+
+def compare(results: pd.DataFrame, baseline_path: str) -> pd.DataFrame:
+    """Adds the relative change of throughput and peak memory against a previous run."""
+    with open(baseline_path, "r", encoding="utf-8") as handle:
+        baseline = pd.DataFrame(json.load(handle)["results"])
+    # Runs with --processes have one unit_score_matrix row per worker count
+    keys = [column for column in ("benchmark", "rows", "processes") if column in results and column in baseline]
+    merged = results.merge(
+        baseline[keys + ["rows_per_s", "peak_mib"]], on=keys, how="left", suffixes=("", "_baseline"),
+    )
+    merged["rows_per_s_change"] = merged["rows_per_s"] / merged["rows_per_s_baseline"] - 1
+    merged["peak_mib_change"] = merged["peak_mib"] / merged["peak_mib_baseline"] - 1
+    return merged.drop(columns=["rows_per_s_baseline", "peak_mib_baseline"])
+
+
+def run(args) -> dict:
+    """Runs the benchmarks described by the parsed command-line ``args``."""
+    results = []
+    with synthetic_brightway(args.activities, args.seed) as database:
+        for rows in args.sizes:
+            results.extend(benchmark_size(database, rows, args))
+    return {
+        "environment": {
+            "aria_version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=20000, help="Activities in the synthetic database.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500], help="Inventory sizes (rows).")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean simulated API latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Maximum latency deviation in seconds.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of failing API requests.")
+    parser.add_argument("--requests-per-minute", type=float, default=None,
+                        help="Send requests through a RateLimitedClient with this request limit.")
+    parser.add_argument("--retries", type=int, default=0,
+                        help="Send requests through a RateLimitedClient retrying failures this many times.")
+    parser.add_argument("--exact-share", type=float, default=0.5, help="Share of rows naming an activity exactly.")
+    parser.add_argument("--max-workers", type=int, default=1, help="Rows matched concurrently.")
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per selection request.")
+    parser.add_argument("--processes", type=int, nargs="+", default=None,
+                        help="Also time the unit scores solved with each of these worker counts.")
+    parser.add_argument("--locations", nargs="+", default=["GLO", "RoW"], help="Locations searched.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    parser.add_argument("--baseline", help="A previous --output file to compare against.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    table = pd.DataFrame(report["results"])
+    if args.baseline:
+        table = compare(table, args.baseline)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(table.to_string(index=False, float_format=lambda value: f"{value:.4g}"))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2, default=str)
+    return report
+
+
+if __name__ == "__main__":
+    main()
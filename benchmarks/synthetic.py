@@ -0,0 +1,244 @@
+# synthetic.py
+
+import random
+from contextlib import contextmanager
+from unittest import mock
+import numpy as np
+import pandas as pd
+import brightway2 as bw
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+from ARIA import activity_index
+
+DATABASE_NAME = "synthetic-ecoinvent"
+
+METHODS = [
+    ("EF v3.1", "climate change", "global warming potential (GWP100)"),
+    ("EF v3.1", "material resources: metals/minerals", "abiotic depletion potential (ADP): elements (ultimate reserves)"),
+    ("EF v3.1", "water use", "user deprivation potential (deprivation-weighted water consumption)"),
+    ("EF v3.1", "acidification", "accumulated exceedance (AE)"),
+]
+
+_MATERIALS = [
+    "steel", "aluminium", "copper", "nickel", "cobalt", "zinc", "lead", "tin", "titanium", "graphite",
+    "glass", "cement", "concrete", "brick", "sand", "gravel", "clay", "lime", "gypsum", "paper",
+    "cardboard", "polyethylene", "polypropylene", "polystyrene", "polyvinylchloride", "nylon", "polyester",
+    "rubber", "ethanol", "methanol", "ammonia", "urea", "sulfuric acid", "nitric acid", "sodium hydroxide",
+    "chlorine", "hydrogen", "oxygen", "nitrogen", "carbon black", "lithium hydroxide", "lithium carbonate",
+    "manganese sulfate", "nickel sulfate", "cobalt sulfate", "ethylene carbonate", "silicon", "wafer",
+    "cotton", "wool", "wood", "plywood", "diesel", "petrol", "natural gas", "coal", "heat", "steam",
+]
+_VARIANTS = [
+    "", "low-alloyed", "unalloyed", "primary", "secondary", "recycled", "technical grade", "liquid",
+    "granulate", "sheet", "wire", "powder", "at plant", "for battery", "high purity", "from scrap",
+]
+_LOCATIONS = ["GLO", "RoW", "RER", "Europe without Switzerland", "CH", "DE", "FR", "GB", "US", "CN", "JP", "IN", "BR", "ZA", "AU"]
+_UNITS = ["kilogram", "kilowatt hour", "megajoule", "cubic meter", "unit"]
+
+
+class SyntheticActivity(dict):
+    """An activity record with the ``key`` attribute of a Brightway activity."""
+
+    @property
+    def key(self):
+        return self["key"]
+
+
+def _activity_names(rng: random.Random):
+    for material in _MATERIALS:
+        for variant in _VARIANTS:
+            product = f"{material}, {variant}" if variant else material
+            yield f"market for {product}", product
+            yield f"{material} production, {variant}" if variant else f"{material} production", product
+            yield f"treatment of waste {material}, {rng.choice(['landfill', 'incineration', 'recycling'])}", f"waste {material}"
+    for voltage in ["low", "medium", "high"]:
+        yield f"market group for electricity, {voltage} voltage", "electricity"
+        yield f"market for electricity, {voltage} voltage", "electricity"
+        for source in ["hard coal", "natural gas", "wind", "solar", "hydro", "nuclear"]:
+            yield f"electricity production, {source}, {voltage} voltage", "electricity"
+
+
+def make_activities(n_activities: int = 20000, seed: int = 0) -> list:
+    """
+    Generates ``n_activities`` activity records with ecoinvent-like names,
+    locations and units. Names repeat across locations, as in ecoinvent.
+    """
+    rng = random.Random(seed)
+    names = list(_activity_names(rng))
+    activities = []
+    while len(activities) < n_activities:
+        for name, product in names:
+            if len(activities) == n_activities:
+                break
+            location = rng.choice(_LOCATIONS)
+            unit = "kilowatt hour" if product == "electricity" else rng.choice(_UNITS[:1] * 4 + _UNITS[2:])
+            code = f"a{len(activities):06d}"
+            activities.append(SyntheticActivity({
+                "name": name,
+                "reference product": product,
+                "location": location,
+                "unit": unit,
+                "key": (DATABASE_NAME, code),
+            }))
+    return activities
+
+
+class SyntheticDatabase:
+    """
+    In-memory stand-in for ``bw.Database`` with a ``search`` that behaves like
+    the Whoosh wildcard search: every term of the query must appear in the
+    activity name. As in Brightway, ``facet="location"`` groups every hit by
+    lowercased location, as raw index documents, and ``get`` loads an
+    activity by code.
+    """
+
+    def __init__(self, activities: list):
+        self.name = DATABASE_NAME
+        self.activities = activities
+        self._names = [activity["name"].lower() for activity in activities]
+        self._codes = {activity.key[1]: activity for activity in activities}
+
+    def __iter__(self):
+        return iter(self.activities)
+
+    def __len__(self):
+        return len(self.activities)
+
+    def get(self, code: str):
+        return self._codes[code]
+
+    def search(self, query: str, limit: int = 25, filter: dict = None, facet: str = None, proxy: bool = True,
+               **kwargs):
+        terms = [term.strip("*") for term in query.lower().split() if term.strip("*")]
+        if facet is not None:
+            grouped = {}
+            for name, activity in zip(self._names, self.activities):
+                if all(term in name for term in terms):
+                    grouped.setdefault(activity[facet].lower(), []).append(
+                        {"database": self.name, "code": activity.key[1], "location": activity["location"].lower()}
+                    )
+            return grouped
+        results = []
+        for name, activity in zip(self._names, self.activities):
+            if all(term in name for term in terms) and all(
+                activity.get(field) == value for field, value in (filter or {}).items()
+            ):
+                results.append(activity)
+                if len(results) == limit:
+                    break
+        return results
+
+
+class SyntheticMatrices:
+    """
+    Sparse LCA matrices for a set of activities: a technosphere with a few
+    inputs per activity (mostly from upstream activities, with some loops),
+    a biosphere of ``n_flows`` elementary flows, and one characterization
+    vector per method.
+    """
+
+    def __init__(self, activities: list, n_flows: int = 1500, inputs_per_activity: int = 6,
+                 flows_per_activity: int = 8, cycle_share: float = 0.02, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        n = len(activities)
+        self.product_dict = {activity.key: i for i, activity in enumerate(activities)}
+
+        columns = np.repeat(np.arange(n), inputs_per_activity)
+        # Inputs mostly come from activities shortly upstream in the supply chain, and
+        # a few close short loops with nearby downstream activities. Keeping the
+        # structure local keeps the LU fill-in, and so the solve cost, close to
+        # that of the real ecoinvent technosphere.
+        rows = np.maximum(columns - rng.geometric(1 / 20, columns.size), 0)
+        loops = rng.random(columns.size) < cycle_share
+        rows[loops] = np.minimum(columns[loops] + rng.integers(1, 50, loops.sum()), n - 1)
+        off_diagonal = rows != columns
+        values = -rng.uniform(0.001, 0.1, columns.size)
+        self.technosphere = sparse.csr_matrix(
+            (
+                np.concatenate([np.ones(n), values[off_diagonal]]),
+                (np.concatenate([np.arange(n), rows[off_diagonal]]),
+                 np.concatenate([np.arange(n), columns[off_diagonal]])),
+            ),
+            shape=(n, n),
+        )
+
+        flow_columns = np.repeat(np.arange(n), flows_per_activity)
+        flow_rows = rng.integers(0, n_flows, flow_columns.size)
+        self.biosphere = sparse.csr_matrix(
+            (rng.lognormal(0, 1, flow_columns.size), (flow_rows, flow_columns)), shape=(n_flows, n)
+        )
+        self.characterization = {}
+        for method in METHODS:
+            factors = np.where(rng.random(n_flows) < 0.3, rng.lognormal(0, 1, n_flows), 0.0)
+            self.characterization[method] = sparse.diags(factors, format="csr")
+
+
+def make_lca_class(matrices: SyntheticMatrices):
+    """Returns a ``bw.LCA`` replacement reading its matrices from ``matrices``."""
+
+    class SyntheticLCA:
+        def __init__(self, demand, method=None):
+            self.demand = demand
+            self.method = method
+
+        def load_lci_data(self):
+            self.activity_dict = self.product_dict = matrices.product_dict
+            self.technosphere_matrix = matrices.technosphere
+            self.biosphere_matrix = matrices.biosphere
+
+        def lci(self):
+            # As in bw2calc, a full LCI also solves the demand
+            self.load_lci_data()
+            self.switch_method(self.method)
+            demand = np.zeros(len(self.product_dict))
+            for key, amount in self.demand.items():
+                demand[self.product_dict[key]] = amount
+            self.supply_array = spsolve(sparse.csc_matrix(self.technosphere_matrix), demand)
+
+        def switch_method(self, method):
+            self.method = method
+            self.characterization_matrix = matrices.characterization[method]
+
+    return SyntheticLCA
+
+
+@contextmanager
+def synthetic_brightway(n_activities: int = 20000, seed: int = 0):
+    """
+    Replaces the Brightway entry points used by ARIA with a synthetic database
+    of ``n_activities`` activities for the duration of the block.
+
+    Yields
+    ------
+    SyntheticDatabase
+        The database, to be passed to ``process_dataframe``.
+    """
+    activities = make_activities(n_activities, seed)
+    database = SyntheticDatabase(activities)
+    matrices = SyntheticMatrices(activities, seed=seed)
+    with mock.patch.multiple(
+        bw,
+        LCA=make_lca_class(matrices),
+        Database=lambda name: database,
+        databases={DATABASE_NAME: {"modified": f"synthetic-{n_activities}-{seed}"}},
+    ), mock.patch.object(activity_index, "_INDEX_CACHE", {}):
+        yield database
+
+
+def make_inventory(database: SyntheticDatabase, n_rows: int, exact_share: float = 0.5, seed: int = 0):
+    """
+    Samples an inventory of ``n_rows`` rows in the Data_inputs layout. About
+    ``exact_share`` of the rows name an activity exactly; the others name its
+    reference product, as inventories usually do.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for activity in rng.choices(database.activities, k=n_rows):
+        exact = rng.random() < exact_share
+        rows.append({
+            "Input/output": activity["name"] if exact else activity["reference product"],
+            "In/out": round(rng.uniform(0.01, 10), 4),
+            "Units": activity["unit"],
+            "Notes": "",
+        })
+    return pd.DataFrame(rows)
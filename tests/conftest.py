@@ -3,23 +3,43 @@
 # conftest.py
 
 import pytest
+import numpy as np
 import brightway2 as bw
+from scipy import sparse
+from ARIA import activity_index
 
 @pytest.fixture
 def mock_bw(monkeypatch):
     """
     A pytest fixture that monkeypatches brightway2 so that:
       1) Database calls return a mock database with a single matching activity
-      2) LCA calls return a fixed 'score' of 42
+      2) LCA calls return a fixed 'score' of 42 per unit of any activity
       3) The mock activity is hashable, so you can do {activity: 1} for functional_unit
     """
 
-    # 1) Mock the LCA class
+    # 1) Mock the LCA class with tiny matrices: every activity supplies itself
+    #    and emits 42 units of a single flow characterized with a factor of 1
     class MockLCA:
-        def __init__(self, fu, method):
-            pass
+        def __init__(self, fu, method=None):
+            self.demand = fu
+            self.method = method
+        def load_lci_data(self):
+            keys = list(self.demand)
+            self.activity_dict = self.product_dict = {key: i for i, key in enumerate(keys)}
+            self.technosphere_matrix = sparse.identity(len(keys), format="csr")
+            self.biosphere_matrix = sparse.csr_matrix(np.full((1, len(keys)), 42.0))
         def lci(self):
-            pass
+            self.load_lci_data()
+            self.switch_method(self.method)
+            self.redo_lci(self.demand)
+        def redo_lci(self, demand):
+            self.demand_array = np.zeros(len(self.product_dict))
+            for key, amount in demand.items():
+                self.demand_array[self.product_dict[key]] = amount
+            self.supply_array = self.demand_array.copy()
+        def switch_method(self, method):
+            self.method = method
+            self.characterization_matrix = sparse.identity(1, format="csr")
         def lcia(self):
             self.score = 42  # fixed score for testing
 
@@ -38,6 +58,13 @@ def mock_bw(monkeypatch):
         def __getitem__(self, key):
             return self._data[key]
 
+        def get(self, key, default=None):
+            return self._data.get(key, default)
+
+        @property
+        def key(self):
+            return ("ecoinvent-3.10.1-cutoff", self._data["name"])
+
         def __hash__(self):
             # Return a stable hash based on unique fields (e.g., name & location)
             return hash((self._data.get("name"), self._data.get("location")))
@@ -63,7 +90,10 @@ def mock_bw(monkeypatch):
     monkeypatch.setattr(bw, "Database", MockDatabase)
 
     # 4) Also ensure 'databases' has our ecoinvent key
-    monkeypatch.setattr(bw, "databases", {"ecoinvent-3.10.1-cutoff": "mocked"})
+    monkeypatch.setattr(bw, "databases", {"ecoinvent-3.10.1-cutoff": {"modified": "mocked"}})
+
+    # 5) Start every test without in-memory activity indexes
+    monkeypatch.setattr(activity_index, "_INDEX_CACHE", {})
 
     return bw
 
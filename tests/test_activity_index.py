@@ -0,0 +1,61 @@
+# test_activity_index.py
+
+import pytest
+import brightway2 as bw
+from ARIA import activity_index
+from ARIA.activity_index import ActivityIndex, get_activity_index
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    # A database whose activities are plain dicts with a 'key' attribute,
+    # counting how often it is iterated over
+    class MockActivity(dict):
+        def __init__(self, data, code):
+            super().__init__(data)
+            self.key = ("test-db", code)
+
+    state = {"scans": 0, "activities": [
+        MockActivity({"name": "steel production", "location": "GLO", "unit": "kilogram"}, "a"),
+        MockActivity({"name": "steel production", "location": "GLO", "unit": "ton"}, "b"),
+        MockActivity({"name": "steel production", "location": "RoW", "unit": "kilogram"}, "c"),
+    ]}
+
+    class MockDatabase:
+        def __init__(self, name):
+            self.name = name
+        def __iter__(self):
+            state["scans"] += 1
+            return iter(state["activities"])
+
+    monkeypatch.setattr(bw, "Database", MockDatabase)
+    monkeypatch.setattr(bw, "databases", {"test-db": {"modified": "v1"}})
+    monkeypatch.setattr(activity_index, "_INDEX_CACHE", {})
+    return state
+
+def test_lookup_by_name_location_and_unit(mock_db):
+    index = ActivityIndex.build("test-db")
+    assert index.lookup("steel production", "GLO") == [("test-db", "a"), ("test-db", "b")]
+    assert index.lookup("steel production", "GLO", "ton") == [("test-db", "b")]
+    # An unknown unit falls back to the (name, location) match
+    assert index.lookup("steel production", "RoW", "m3") == [("test-db", "c")]
+    assert index.lookup("aluminium production", "GLO") == []
+
+def test_index_is_built_once_and_rebuilt_on_change(mock_db):
+    get_activity_index("test-db")
+    get_activity_index("test-db")
+    assert mock_db["scans"] == 1
+
+    bw.databases["test-db"]["modified"] = "v2"
+    index = get_activity_index("test-db")
+    assert mock_db["scans"] == 2
+    assert index.version == "v2"
+
+def test_index_is_persisted(mock_db, tmp_path, monkeypatch):
+    path = str(tmp_path / "index.json")
+    get_activity_index("test-db", path)
+
+    # A new session reuses the stored index without scanning the database
+    monkeypatch.setattr(activity_index, "_INDEX_CACHE", {})
+    index = get_activity_index("test-db", path)
+    assert mock_db["scans"] == 1
+    assert index.lookup("steel production", "GLO", "ton") == [("test-db", "b")]
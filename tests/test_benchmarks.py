@@ -0,0 +1,42 @@
+# test_benchmarks.py
+
+import json
+import pytest
+from benchmarks.fake_client import FakeChatClient, FakeAPIError
+from benchmarks.run_benchmarks import main
+
+def test_fake_client_answers_selection_and_fails_on_demand():
+    client = FakeChatClient(latency=0.0)
+    prompt = "Candidates:\n1. steel production, GLO, kg\n2. market for steel, RoW, kg\n"
+    response = client.chat.completions.create(messages=[{"role": "user", "content": prompt}])
+    assert response.choices[0].message.content == "1"
+
+    failing = FakeChatClient(latency=0.0, failure_rate=1.0)
+    with pytest.raises(FakeAPIError) as error:
+        failing.chat.completions.create(messages=[{"role": "user", "content": prompt}])
+    assert error.value.status_code in (429, 500)
+    assert failing.failures == 1
+
+def test_benchmark_suite_runs_on_a_small_database(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    args = ["--activities", "300", "--sizes", "5", "--latency", "0", "--jitter", "0", "--output", str(output)]
+    main(args)
+    main(args + ["--output", str(tmp_path / "again.json"), "--baseline", str(output)])
+
+    results = json.loads(output.read_text())["results"]
+    assert [result["benchmark"] for result in results] == [
+        "process_dataframe", "run_impact_assessment", "plot_lcia_waterfall_charts"
+    ]
+    assert all(result["rows_per_s"] > 0 and result["peak_mib"] > 0 for result in results)
+    assert "rows_per_s_change" in capsys.readouterr().out
+
+def test_benchmark_times_the_lca_solve_per_worker_count(tmp_path):
+    output = tmp_path / "results.json"
+    args = ["--activities", "300", "--sizes", "20", "--latency", "0", "--jitter", "0", "--processes", "1", "2"]
+    main(args + ["--output", str(output)])
+    main(args + ["--baseline", str(output)])
+
+    results = json.loads(output.read_text())["results"]
+    solves = [result for result in results if result["benchmark"] == "unit_score_matrix"]
+    assert [result["processes"] for result in solves] == [1, 2]
+    assert all(result["seconds"] > 0 for result in solves)
@@ -0,0 +1,88 @@
+# test_checkpoint.py
+
+import pytest
+import pandas as pd
+from ARIA.checkpoint import CheckpointJournal
+from ARIA.search_workflow import process_dataframe
+
+class MockDB:
+    def search(self, query, limit=50, filter=None):
+        return [{"name": "steel production", "location": "GLO", "unit": "kg"}]
+
+class FlakyClient:
+    # Answers with the activity name and fails on the activity listed in 'fail_on'
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = 0
+        self.chat = type("MockChat", (object,), {})()
+        self.chat.completions = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        activity = kwargs["messages"][-1]["content"].split("used for '")[1].split("'")[0]
+        if activity == self.fail_on:
+            raise RuntimeError("connection dropped")
+        return type("MockResponse", (object,), {
+            "choices": [type("MockChoice", (object,), {
+                "message": type("MockMessage", (object,), {"content": f"{activity} dataset"})
+            })]
+        })()
+
+def test_journal_ignores_torn_lines(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = CheckpointJournal(path)
+    journal.append({"index": 0, "activity": "steel", "notes": "", "selection": "x"})
+    with open(path, "a") as handle:
+        handle.write('{"index": 1, "activi')
+
+    assert len(journal.load()) == 1
+
+@pytest.mark.parametrize("load_first", [True, False])
+def test_append_after_torn_line_starts_a_new_line(tmp_path, load_first):
+    path = tmp_path / "journal.jsonl"
+    CheckpointJournal(path).append({"index": 0, "activity": "steel", "notes": "", "selection": "x"})
+    with open(path, "a") as handle:
+        handle.write('{"index": 1, "activi')
+
+    # A new run resumes from the journal and records the row that was torn
+    journal = CheckpointJournal(path)
+    if load_first:
+        journal.load()
+    journal.append({"index": 1, "activity": "copper", "notes": "", "selection": "y"})
+
+    records = CheckpointJournal(path).load()
+    assert sorted(record["selection"] for record in records.values()) == ["x", "y"]
+
+def test_interrupted_run_resumes_remaining_rows(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    df = pd.DataFrame({"Input/output": ["steel", "copper", "glass"]})
+
+    with pytest.raises(RuntimeError):
+        process_dataframe(df.copy(), MockDB(), FlakyClient(fail_on="copper"), checkpoint_path=path)
+
+    client = FlakyClient()
+    result_df = process_dataframe(df.copy(), MockDB(), client, checkpoint_path=path)
+
+    assert list(result_df["Ecoinvent process"]) == ["steel dataset", "copper dataset", "glass dataset"]
+    assert client.calls == 2  # only 'copper' and 'glass' were selected again
+    assert len(CheckpointJournal(path).load()) == 3
+
+    client = FlakyClient()
+    process_dataframe(df.copy(), MockDB(), client, checkpoint_path=path, resume=False)
+    assert client.calls == 3
+
+def test_journal_of_another_run_is_not_replayed(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    df = pd.DataFrame({"Input/output": ["steel", "copper"]})
+    process_dataframe(df.copy(), MockDB(), FlakyClient(), checkpoint_path=path)
+
+    # Same rows, other locations: the recorded selections do not apply
+    with pytest.raises(ValueError, match="other parameters"):
+        process_dataframe(df.copy(), MockDB(), FlakyClient(), locations=["CH"], checkpoint_path=path)
+    with pytest.raises(ValueError, match="other parameters"):
+        process_dataframe(df.copy(), MockDB(), FlakyClient(), user_message="prefer markets", checkpoint_path=path)
+
+    client = FlakyClient()
+    process_dataframe(df.copy(), MockDB(), client, locations=["CH"], checkpoint_path=path, resume=False)
+    assert client.calls == 2
+    assert len(CheckpointJournal(path, run={"user_message": "", "locations": ["CH"], "database": None}).load()) == 2
@@ -0,0 +1,111 @@
+# test_completion_cache.py
+
+import time
+import pytest
+import pandas as pd
+from ARIA.completion_cache import CompletionCache, CachedClient, make_cache_key
+from ARIA.search_workflow import process_dataframe
+
+@pytest.fixture
+def counting_client():
+    # An openai-like client that counts how many requests reach the "network"
+    class MockCompletions:
+        def __init__(self):
+            self.calls = 0
+        def create(self, **kwargs):
+            self.calls += 1
+            return type("MockResponse", (object,), {
+                "choices": [
+                    type("MockChoice", (object,), {
+                        "message": type("MockMessage", (object,), {
+                            "content": f"answer {self.calls}"
+                        })
+                    })
+                ]
+            })()
+
+    class MockClient:
+        def __init__(self):
+            self.chat = type("MockChat", (object,), {})()
+            self.chat.completions = MockCompletions()
+    return MockClient()
+
+def test_make_cache_key_depends_on_sampling_parameters():
+    messages = [{"role": "user", "content": "hello"}]
+    key = make_cache_key(model="gpt-3.5-turbo", messages=messages, temperature=0.7)
+    assert key == make_cache_key(temperature=0.7, messages=messages, model="gpt-3.5-turbo")
+    assert key != make_cache_key(model="gpt-3.5-turbo", messages=messages, temperature=0.2)
+    assert key == make_cache_key(model="gpt-3.5-turbo", messages=messages, temperature=0.7, timeout=10)
+
+def test_cached_client_counts_hits_and_misses(counting_client):
+    cache = CompletionCache()
+    client = CachedClient(counting_client, cache)
+    kwargs = {"model": "gpt-3.5-turbo", "messages": [{"role": "user", "content": "hi"}]}
+
+    first = client.chat.completions.create(**kwargs)
+    second = client.chat.completions.create(**kwargs)
+
+    assert first.choices[0].message.content == second.choices[0].message.content == "answer 1"
+    assert counting_client.chat.completions.calls == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+def test_completions_without_content_are_not_cached():
+    class RefusingCompletions:
+        # Answers without text, as a refusal or tool call does
+        def __init__(self):
+            self.calls = 0
+        def create(self, **kwargs):
+            self.calls += 1
+            return type("MockResponse", (object,), {
+                "choices": [type("MockChoice", (object,), {
+                    "message": type("MockMessage", (object,), {"content": None})
+                })]
+            })()
+
+    completions = RefusingCompletions()
+    cache = CompletionCache()
+    client = CachedClient(type("MockClient", (object,), {"chat": type("MockChat", (object,), {"completions": completions})})(), cache)
+    kwargs = {"model": "gpt-3.5-turbo", "messages": [{"role": "user", "content": "hi"}]}
+
+    assert client.chat.completions.create(**kwargs).choices[0].message.content is None
+    assert client.chat.completions.create(**kwargs).choices[0].message.content is None
+    assert completions.calls == 2
+    cache.set("key", None)
+    assert len(cache) == 0
+
+def test_cache_persists_to_disk(tmp_path):
+    path = tmp_path / "completions.sqlite"
+    cache = CompletionCache(path)
+    cache.set("key", "stored answer")
+    cache.close()
+
+    reopened = CompletionCache(path)
+    assert reopened.get("key") == "stored answer"
+
+def test_cache_eviction_by_size_and_age():
+    cache = CompletionCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")  # "b" becomes the least recently used entry
+    cache.set("c", "3")
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+    aged = CompletionCache(max_age=0.01)
+    aged.set("old", "value")
+    time.sleep(0.02)
+    assert aged.get("old") is None
+
+def test_warm_rerun_makes_no_api_calls(counting_client):
+    class MockDB:
+        def search(self, query, limit=50, filter=None):
+            return [{"name": "waste something", "location": "GLO", "unit": "kg"}]
+
+    cache = CompletionCache()
+    df = pd.DataFrame({"Input/output": ["Waste Graphite", "Steel"]})
+    process_dataframe(df.copy(), MockDB(), counting_client, cache=cache)
+    calls_after_cold_run = counting_client.chat.completions.calls
+
+    process_dataframe(df.copy(), MockDB(), counting_client, cache=cache)
+    assert counting_client.chat.completions.calls == calls_after_cold_run
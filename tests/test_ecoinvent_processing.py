@@ -21,3 +21,11 @@ def test_process_ecoinvent_dataframe():
     assert processed.loc[0, "Process"] == "some process"
     assert processed.loc[0, "Location"] == "GLO"
     assert processed.loc[0, "Units"] == "kg"
+
+def test_parse_ecoinvent_process():
+    from ARIA.ecoinvent_processing import parse_ecoinvent_process
+    assert parse_ecoinvent_process("- some process, GLO, kg") == ("some process", "GLO", "kg")
+    assert parse_ecoinvent_process("market for steel, low-alloyed, RoW, kg") == (
+        "market for steel, low-alloyed", "RoW", "kg"
+    )
+    assert parse_ecoinvent_process("name only") == ("name only", None, None)
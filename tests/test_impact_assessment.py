@@ -19,3 +19,59 @@ def test_run_impact_assessment():
     # Because LCA score = 42, 'In/out' = 1.5 => expected GWP = 63
     assert len(out_df) == 1, "Row should remain if there's a match"
     assert out_df.loc[0, "GWP"] == 63, "Expected GWP to be 63 (1.5 * 42)."
+
+@pytest.mark.usefixtures("mock_bw")
+def test_run_impact_assessment_float_columns_and_registry(monkeypatch):
+    from ARIA import impact_assessment
+    monkeypatch.setattr(impact_assessment, "IMPACT_CATEGORIES", dict(impact_assessment.IMPACT_CATEGORIES))
+    impact_assessment.register_impact_category("Land use", lambda method: "land use" in method[1])
+
+    df = pd.DataFrame({
+        "Process": ["dummy process", "dummy process", "unknown process"],
+        "Location": ["GLO", "GLO", "GLO"],
+        "In/out": [1.0, -2.0, 3.0]
+    })
+    lcia_methods = [
+        ("EF v3.1", "climate change", "global warming potential (GWP100)"),
+        ("EF v3.1", "land use", "soil quality index"),
+        ("Custom", "noise"),
+    ]
+
+    out_df = run_impact_assessment(df, lcia_methods, "ecoinvent-3.10.1-cutoff")
+
+    # The unmatched row is dropped; the others are scaled by the absolute 'In/out'
+    assert list(out_df["GWP"]) == [42.0, 84.0]
+    assert list(out_df["Land use"]) == [42.0, 84.0]
+    assert list(out_df["noise"]) == [42.0, 84.0]
+    assert out_df["GWP"].dtype == "float64"
+    assert out_df["ADP"].isna().all()
+
+@pytest.mark.usefixtures("mock_bw")
+def test_iter_impact_assessment_consumes_records():
+    from ARIA.impact_assessment import iter_impact_assessment
+
+    records = iter([
+        {"index": 0, "selection": "- dummy process, GLO, kg", "row": {"In/out": 2.0}},
+        {"index": 1, "selection": "unknown process, GLO, kg", "row": {"In/out": 1.0}},
+    ])
+    lcia_methods = [("EF v3.1", "climate change", "global warming potential (GWP100)")]
+    results = list(iter_impact_assessment(records, lcia_methods))
+
+    assert results[0]["Process"] == "dummy process"
+    assert results[0]["impacts"] == {"GWP": 84.0}
+    assert results[1]["key"] is None
+    assert results[1]["impacts"] == {}
+
+@pytest.mark.usefixtures("mock_bw")
+def test_activity_key_skips_the_name_lookup():
+    df = pd.DataFrame({
+        "Process": ["misspelled process"],
+        "Location": ["XX"],
+        "In/out": [2.0],
+        "Activity key": [("ecoinvent-3.10.1-cutoff", "dummy process")],
+    })
+    lcia_methods = [("EF v3.1", "climate change", "global warming potential (GWP100)")]
+
+    out_df = run_impact_assessment(df, lcia_methods, "ecoinvent-3.10.1-cutoff")
+
+    assert out_df.loc[0, "GWP"] == 84
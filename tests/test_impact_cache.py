@@ -0,0 +1,46 @@
+# test_impact_cache.py
+
+import pytest
+import numpy as np
+import pandas as pd
+import brightway2 as bw
+from ARIA import impact_assessment
+from ARIA.impact_cache import UnitImpactCache
+from ARIA.impact_assessment import run_impact_assessment
+
+METHODS = [("EF v3.1", "climate change", "global warming potential (GWP100)")]
+
+def test_cache_round_trip_and_version_invalidation(tmp_path):
+    path = tmp_path / "impacts.sqlite"
+    methods = METHODS + [("EF v3.1", "water use", "user deprivation potential (deprivation-weighted water consumption)")]
+    cache = UnitImpactCache(path)
+    cache.set("db", "v1", ("db", "steel"), methods, ["m1", "m1"], np.array([2.0, np.nan]))
+    cache.close()
+
+    cache = UnitImpactCache(path)
+    scores = cache.get("db", "v1", ("db", "steel"), methods, ["m1", "m1"])
+    np.testing.assert_array_equal(scores, [2.0, np.nan])
+    # A new database or method version invalidates the stored scores
+    assert cache.get("db", "v2", ("db", "steel"), methods, ["m1", "m1"]) is None
+    assert cache.get("db", "v1", ("db", "steel"), methods, ["m1", "m2"]) is None
+    assert cache.get("db", "v1", ("db", "steel"), methods[:1] + [("other",)], ["m1", "m1"]) is None
+    assert cache.stats()["hits"] == 1
+
+@pytest.mark.usefixtures("mock_bw")
+def test_cached_activities_need_no_lca(monkeypatch):
+    monkeypatch.setattr(impact_assessment, "method_version", lambda method: "v1")
+    constructed = []
+    mock_lca = bw.LCA
+    def counting_lca(*args, **kwargs):
+        constructed.append(args)
+        return mock_lca(*args, **kwargs)
+    monkeypatch.setattr(bw, "LCA", counting_lca)
+
+    cache = UnitImpactCache()
+    for _ in range(2):
+        df = pd.DataFrame({"Process": ["dummy process"], "Location": ["GLO"], "In/out": [2.0]})
+        out_df = run_impact_assessment(df, METHODS, impact_cache=cache)
+        assert out_df.loc[0, "GWP"] == 84
+
+    assert len(constructed) == 1
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,57 @@
+# test_instrumentation.py
+
+import json
+import pytest
+import pandas as pd
+from types import SimpleNamespace
+from ARIA.instrumentation import MetricsCollector
+from ARIA.search_workflow import process_dataframe
+from ARIA.impact_assessment import run_impact_assessment
+
+class MockDB:
+    def search(self, query, limit=50, filter=None):
+        return [{"name": "steel production", "location": "GLO", "unit": "kg"}]
+
+class UsageClient:
+    # Answers every request and reports 100 prompt and 5 completion tokens
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="steel production, GLO, kg"))],
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=5),
+        )
+
+def test_process_dataframe_records_stages_and_tokens(tmp_path):
+    metrics = MetricsCollector()
+    df = pd.DataFrame({"Input/output": ["steel", "iron"]})
+
+    process_dataframe(df, MockDB(), UsageClient(), metrics=metrics)
+
+    summary = metrics.summary().set_index("stage")
+    assert summary.loc["row", "count"] == 2
+    assert summary.loc["search", "count"] == 2
+    assert summary.loc["selection", "chat_calls"] == 2
+    assert summary.loc["selection", "prompt_tokens"] == 200
+    assert summary.loc["row", "completion_tokens"] == 10
+    assert [span["chat_calls"] for span in metrics.spans if span["stage"] == "row"] == [1, 1]
+
+    payload = json.loads(metrics.to_json(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text()) == payload
+    assert {row["stage"] for row in payload["summary"]} == {"row", "search", "selection"}
+
+@pytest.mark.usefixtures("mock_bw")
+def test_impact_assessment_records_lca_stages():
+    metrics = MetricsCollector()
+    df = pd.DataFrame({"Process": ["dummy process"], "Location": ["GLO"], "In/out": [1.0]})
+
+    run_impact_assessment(df, [("EF v3.1", "climate change", "global warming potential (GWP100)")], metrics=metrics)
+
+    stages = set(metrics.summary()["stage"])
+    assert {"activity_index", "activity_lookup", "lci", "lca_solve"} <= stages
+
+def test_empty_summary_has_columns():
+    assert list(MetricsCollector().summary().columns) == [
+        "stage", "count", "total_s", "mean_s", "max_s", "chat_calls", "prompt_tokens", "completion_tokens"
+    ]
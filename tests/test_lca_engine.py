@@ -0,0 +1,115 @@
+# test_lca_engine.py
+
+import pytest
+import numpy as np
+import brightway2 as bw
+from scipy import sparse
+from scipy.sparse.linalg import spsolve, splu
+from ARIA.lca_engine import LCAEngine
+
+# Two activities (the second consumes 0.5 of the first) and two biosphere flows
+TECHNOSPHERE = np.array([[1.0, -0.5], [0.0, 1.0]])
+BIOSPHERE = np.array([[1.0, 2.0], [0.0, 3.0]])
+FACTORS = {
+    ("test", "method one"): [1.0, 0.0],
+    ("test", "method two"): [2.0, 10.0],
+}
+KEYS = [("db", "first"), ("db", "second")]
+
+@pytest.fixture
+def counting_lca(monkeypatch):
+    calls = {"lci": 0, "redo_lci": 0, "solve": 0}
+
+    # Shaped like bw2calc 1.8: lci() builds the matrices, then solves the demand
+    class MatrixLCA:
+        def __init__(self, demand, method=None):
+            self.demand = demand
+            self.method = method
+        def load_lci_data(self):
+            self.activity_dict = self.product_dict = {key: i for i, key in enumerate(KEYS)}
+            self.technosphere_matrix = sparse.csr_matrix(TECHNOSPHERE)
+            self.biosphere_matrix = sparse.csr_matrix(BIOSPHERE)
+        def lci(self):
+            calls["lci"] += 1
+            self.load_lci_data()
+            self._solve(self.demand)
+        def redo_lci(self, demand):
+            calls["redo_lci"] += 1
+            self._solve(demand)
+        def _solve(self, demand):
+            calls["solve"] += 1
+            self.demand_array = np.zeros(len(KEYS))
+            for key, amount in demand.items():
+                self.demand_array[self.product_dict[key]] = amount
+            self.supply_array = spsolve(self.technosphere_matrix.tocsc(), self.demand_array)
+        def switch_method(self, method):
+            self.method = method
+            self.characterization_matrix = sparse.diags(FACTORS[method])
+
+    monkeypatch.setattr(bw, "LCA", MatrixLCA)
+    return calls
+
+def test_unit_scores_cover_all_methods(counting_lca):
+    engine = LCAEngine(KEYS, list(FACTORS))
+
+    np.testing.assert_allclose(engine.unit_scores(("db", "first")), [1.0, 2.0])
+    # One unit of the second activity pulls in 0.5 of the first: flows = [2.5, 3]
+    np.testing.assert_allclose(engine.unit_scores(("db", "second")), [2.5, 35.0])
+
+def test_unit_score_matrix_factorizes_once(counting_lca, monkeypatch):
+    from ARIA import lca_engine
+    factorizations = []
+    def counting_splu(matrix):
+        factorizations.append(matrix)
+        return splu(matrix)
+    monkeypatch.setattr(lca_engine, "splu", counting_splu)
+
+    engine = LCAEngine(KEYS, list(FACTORS))
+    scores = engine.unit_score_matrix(KEYS + KEYS[::-1], chunk_size=3)
+
+    np.testing.assert_allclose(scores, [[1.0, 2.0], [2.5, 35.0], [2.5, 35.0], [1.0, 2.0]])
+    assert scores.dtype == np.float64
+    assert len(factorizations) == 1
+    # The matrices are only built: bw2calc does not solve the combined demand first
+    assert counting_lca["solve"] == 0
+
+def test_parallel_unit_score_matrix_matches_serial(counting_lca):
+    engine = LCAEngine(KEYS, list(FACTORS))
+    keys = KEYS * 5 + [KEYS[1]]
+    serial = engine.unit_score_matrix(keys)
+    parallel = engine.unit_score_matrix(keys, chunk_size=2, processes=2)
+
+    np.testing.assert_allclose(parallel, serial)
+    assert parallel.shape == (len(keys), len(FACTORS))
+
+def test_parallel_chunks_are_split_over_the_workers(counting_lca, monkeypatch):
+    from ARIA import lca_engine
+    pools = []
+    class InlinePool:
+        def __init__(self, max_workers, initializer, initargs):
+            pools.append({"max_workers": max_workers, "chunks": []})
+            initializer(*initargs)
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def map(self, func, chunks):
+            pools[-1]["chunks"] = [len(chunk) for chunk in chunks]
+            return map(func, chunks)
+    monkeypatch.setattr(lca_engine, "ProcessPoolExecutor", InlinePool)
+    engine = LCAEngine(KEYS, list(FACTORS))
+
+    # Ten keys over four workers: chunks of three, not one chunk of chunk_size
+    scores = engine.unit_score_matrix(KEYS * 5, processes=4)
+    assert pools[-1] == {"max_workers": 4, "chunks": [3, 3, 3, 1]}
+    np.testing.assert_allclose(scores, engine.unit_score_matrix(KEYS * 5))
+    # No more workers than chunks, and chunk_size still caps a chunk
+    engine.unit_score_matrix(KEYS, processes=8)
+    assert pools[-1] == {"max_workers": 2, "chunks": [1, 1]}
+    engine.unit_score_matrix(KEYS * 5, chunk_size=2, processes=2)
+    assert pools[-1] == {"max_workers": 2, "chunks": [2, 2, 2, 2, 2]}
+
+def test_engine_without_methods_returns_no_scores(counting_lca):
+    engine = LCAEngine(KEYS, [])
+
+    assert engine.unit_score_matrix(KEYS).shape == (2, 0)
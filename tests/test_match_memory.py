@@ -0,0 +1,110 @@
+# test_match_memory.py
+
+import pandas as pd
+import pytest
+from ARIA import match_memory
+from ARIA.activity_index import ActivityIndex
+from ARIA.match_memory import MatchMemory
+from ARIA.search_workflow import process_dataframe, iter_process_dataframe
+
+class KeyedDB:
+    def __init__(self):
+        self.searches = 0
+    def search(self, query, limit=50, filter=None):
+        self.searches += 1
+        return [
+            {"name": "market for copper", "location": "GLO", "unit": "kg", "key": ("db", "a")},
+            {"name": "copper production, primary", "location": "GLO", "unit": "kg", "key": ("db", "b")},
+        ]
+
+INDEX = ActivityIndex("db", "modified-1", [
+    ("market for copper", "GLO", "kg", ("db", "a")),
+    ("copper production, primary", "GLO", "kg", ("db", "b")),
+])
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = type("MockChat", (object,), {})()
+        self.chat.completions = self
+    def create(self, **kwargs):
+        self.calls += 1
+        answer = '{"1": 2, "2": 2}' if "Row 1:" in kwargs["messages"][-1]["content"] else "2"
+        return type("MockResponse", (object,), {
+            "choices": [type("MockChoice", (object,), {
+                "message": type("MockMessage", (object,), {"content": answer})
+            })]
+        })()
+
+def test_memory_is_normalized_and_scoped_to_the_release(tmp_path):
+    path = tmp_path / "memory.sqlite"
+    memory = MatchMemory(path, database="db", release="3.10")
+    memory.remember("Copper  Wire", "drawn", ["GLO", "RoW"], "market for copper, GLO, kg", ("db", "a"))
+
+    assert memory.get("copper wire", " drawn ", ["GLO", "RoW"]) == {
+        "selection": "market for copper, GLO, kg", "activity_key": ("db", "a"),
+    }
+    assert memory.get("copper wire", "drawn", ["RoW", "GLO"]) is None
+    assert memory.get("copper wire", "", ["GLO", "RoW"]) is None
+    memory.close()
+
+    # Entries persist, but only for the release they were approved for
+    assert len(MatchMemory(path, database="db", release="3.10")) == 1
+    assert MatchMemory(path, database="db", release="3.11").get("copper wire", "drawn", ["GLO", "RoW"]) is None
+
+def test_modified_timestamp_is_an_opt_in_check(monkeypatch, tmp_path):
+    stamps = iter(["modified-1", "modified-2"])
+    monkeypatch.setattr(match_memory, "database_version", lambda database: next(stamps))
+    path = tmp_path / "memory.sqlite"
+    memory = MatchMemory(path, database="db", check_modified=True)
+    memory.remember("copper", "", None, "market for copper, GLO, kg", ("db", "a"))
+    assert memory.get("copper") is not None
+
+    # Once the database has been written to, a checking store ignores the entry...
+    assert MatchMemory(path, database="db", check_modified=True).get("copper") is None
+    # ...while a default store never reads the timestamp
+    monkeypatch.setattr(match_memory, "database_version", None)
+    default = MatchMemory(path, database="db")
+    default.remember("copper", "", None, "market for copper, GLO, kg", ("db", "a"))
+    assert default.get("copper") is not None
+
+def test_approve_in_bulk_resolves_keys_from_the_selection():
+    memory = MatchMemory(database="db")
+    reviewed = pd.DataFrame({
+        "Input/output": ["Copper", "Copper wire", "Unobtainium"],
+        "Notes": [None, "", "rare"],
+        # The second selection was corrected by hand after the run
+        "Ecoinvent process": ["copper production, primary, GLO, kg", "market for copper, GLO, kg", "7"],
+        "Activity key": pd.Series([("db", "b"), ("db", "b"), None], dtype=object),
+    })
+
+    assert memory.approve(reviewed, index=INDEX) == 2
+    assert memory.get("copper")["activity_key"] == ("db", "b")
+    assert memory.get("copper wire")["activity_key"] == ("db", "a")
+    assert memory.get("unobtainium", "rare") is None
+
+    memory.forget("copper")
+    assert len(memory) == 1
+
+@pytest.mark.parametrize("options", [{}, {"max_workers": 2}, {"batch_size": 5}])
+def test_curated_matches_skip_search_and_llm(options):
+    memory = MatchMemory(database="db")
+    memory.remember("copper", "", None, "market for copper, GLO, kg", ("db", "a"))
+
+    df = pd.DataFrame({"Input/output": ["Copper", "copper cable"]})
+    db, client = KeyedDB(), CountingClient()
+    result_df = process_dataframe(df, db, client, match_memory=memory, **options)
+
+    assert result_df.loc[0, "Ecoinvent process"] == "market for copper, GLO, kg"
+    assert result_df.loc[0, "Activity key"] == ("db", "a")
+    assert result_df.loc[1, "Activity key"] == ("db", "b")
+    assert db.searches == 1
+    assert client.calls == 1
+    assert memory.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+    # Approving the run's matches resolves the whole inventory from memory next time
+    memory.approve(iter_process_dataframe(df, db, client, match_memory=memory), index=INDEX)
+    db, client = KeyedDB(), CountingClient()
+    records = list(iter_process_dataframe(df, db, client, match_memory=memory, **options))
+    assert [record["path"] for record in records] == ["memory", "memory"]
+    assert db.searches == 0 and client.calls == 0
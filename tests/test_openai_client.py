@@ -0,0 +1,105 @@
+# test_openai_client.py
+
+import time
+import pytest
+from types import SimpleNamespace
+from ARIA.openai_client import RateLimitedClient, TokenBucket, is_transient_error
+from ARIA.search_utils import get_alternative_search_terms
+
+class APIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+class ScriptedClient:
+    # Raises the scripted errors in turn, then answers; optionally sleeps on the first call
+    def __init__(self, errors=(), first_delay=0.0):
+        self.errors = list(errors)
+        self.first_delay = first_delay
+        self.calls = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if len(self.calls) == 1 and self.first_delay:
+            time.sleep(self.first_delay)
+            return self._response("slow")
+        if self.errors:
+            raise self.errors.pop(0)
+        return self._response("alpha, beta")
+
+    @staticmethod
+    def _response(content):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def ask(client):
+    return client.chat.completions.create(messages=[{"role": "user", "content": "hi"}], max_tokens=5)
+
+def test_transient_errors_are_retried_with_timeout():
+    inner = ScriptedClient([APIError(429), APIError(503)])
+    client = RateLimitedClient(inner, backoff_base=0.01, timeout=7)
+
+    assert ask(client).choices[0].message.content == "alpha, beta"
+    assert len(inner.calls) == 3
+    assert all(call["timeout"] == 7 for call in inner.calls)
+    assert client.stats()["retries"] == 2
+
+def test_permanent_errors_and_exhausted_retries_are_raised():
+    with pytest.raises(APIError):
+        ask(RateLimitedClient(ScriptedClient([APIError(400)]), backoff_base=0.01))
+    with pytest.raises(APIError):
+        ask(RateLimitedClient(ScriptedClient([APIError(500)] * 3), max_retries=2, backoff_base=0.01))
+    assert is_transient_error(TimeoutError()) and not is_transient_error(ValueError())
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(per_minute=600)  # 10 per second, 600 at once
+    bucket.tokens = 0
+    start = time.monotonic()
+    bucket.acquire(2)
+    assert 0.15 <= time.monotonic() - start < 1
+
+def test_slow_requests_are_hedged():
+    inner = ScriptedClient(first_delay=0.5)
+    client = RateLimitedClient(inner, hedge_after=0.05)
+
+    start = time.monotonic()
+    assert ask(client).choices[0].message.content == "alpha, beta"
+    assert time.monotonic() - start < 0.4
+    assert client.stats()["hedges"] == 1
+
+def test_hedge_timer_ignores_queueing_and_rate_limit_waits():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    class ConcurrencyClient:
+        def __init__(self):
+            self.running = self.peak = 0
+            self.lock = threading.Lock()
+            self.chat = SimpleNamespace(completions=self)
+        def create(self, **kwargs):
+            with self.lock:
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            time.sleep(0.1)
+            with self.lock:
+                self.running -= 1
+            return ScriptedClient._response("ok")
+
+    # More concurrent callers than a default thread pool has threads
+    inner = ConcurrencyClient()
+    client = RateLimitedClient(inner, hedge_after=1.0)
+    with ThreadPoolExecutor(max_workers=64) as executor:
+        list(executor.map(lambda _: ask(client), range(64)))
+    assert inner.peak == 64
+    assert client.stats()["hedges"] == 0
+
+    # A request held back by the rate limit is not hedged for the wait
+    client = RateLimitedClient(ScriptedClient(), requests_per_minute=600, hedge_after=0.05)
+    client.request_bucket.tokens = 0
+    ask(client)
+    assert client.stats()["hedges"] == 0
+
+def test_alternative_terms_raise_on_rate_limit():
+    with pytest.raises(APIError):
+        get_alternative_search_terms(ScriptedClient([APIError(429)]), "waste graphite")
+    assert get_alternative_search_terms(ScriptedClient([ValueError("bad")]), "waste graphite") == []
@@ -0,0 +1,41 @@
+# test_package_import.py
+
+import os
+import subprocess
+import sys
+import pytest
+
+HEAVY_MODULES = ["brightway2", "openai", "seaborn", "plotly", "matplotlib", "pandas"]
+
+SCRIPT = """
+import sys
+import {module}
+print(",".join(name for name in {modules!r} if name in sys.modules))
+"""
+
+def run_fresh(script):
+    # A fresh interpreter without credentials in the environment
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("ECOINVENT_", "OPENAI_"))}
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, check=True)
+    return result.stdout.split("\n")
+
+def test_import_is_side_effect_free():
+    loaded, _ = run_fresh(SCRIPT.format(module="ARIA", modules=HEAVY_MODULES))
+    assert loaded == ""
+
+def test_search_utils_does_not_import_openai():
+    loaded, _ = run_fresh(SCRIPT.format(module="ARIA.search_utils", modules=["openai"]))
+    assert loaded == ""
+
+def test_exports_load_on_first_access():
+    import ARIA
+    from ARIA.search_utils import build_search_query
+
+    assert ARIA.build_search_query is build_search_query
+    assert set(ARIA.__all__) <= set(dir(ARIA))
+    with pytest.raises(AttributeError):
+        ARIA.not_an_export
+
+def test_credentials_are_read_at_call_time():
+    # Raises CalledProcessError if importing needs credentials
+    run_fresh("import ARIA.project_setup, ARIA.openai_client")
@@ -0,0 +1,70 @@
+# test_portfolio.py
+
+import pytest
+import pandas as pd
+from ARIA.portfolio import run_portfolio, load_inventories
+
+METHODS = [("EF v3.1", "climate change", "global warming potential (GWP100)")]
+
+class MockDB:
+    def search(self, query, limit=50, filter=None):
+        return [{"name": "dummy process", "location": "GLO", "unit": "kg"}]
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = type("MockChat", (object,), {})()
+        self.chat.completions = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return type("MockResponse", (object,), {
+            "choices": [type("MockChoice", (object,), {
+                "message": type("MockMessage", (object,), {"content": "dummy process, GLO, kg"})
+            })]
+        })()
+
+@pytest.mark.usefixtures("mock_bw")
+def test_portfolio_matches_unique_activities_once(tmp_path):
+    inventories = {
+        "pen": pd.DataFrame({"Input/output": ["Steel", "Plastic"], "In/out": [1.0, 2.0], "Units": ["kg", "kg"]}),
+        "battery": pd.DataFrame({"Input/output": ["steel ", "Copper"], "In/out": [0.5, 1.0], "Units": ["kg", "kg"]}),
+    }
+    client = CountingClient()
+
+    results = run_portfolio(inventories, MockDB(), client, METHODS, output_dir=tmp_path)
+
+    assert client.calls == 3  # steel, plastic, copper
+    assert list(results) == ["pen", "battery"]
+    assert list(results["pen"]["GWP"]) == [42, 84]
+    assert list(results["battery"]["GWP"]) == [21, 42]
+    written = pd.read_csv(tmp_path / "battery_results.csv")
+    assert list(written["GWP"]) == [21, 42]
+
+def test_load_inventories_from_directory(tmp_path):
+    pytest.importorskip("openpyxl")
+    pd.DataFrame({"Input/output": ["Steel"], "In/out": [1.0], "Units": ["kg"], "Notes": [""]}).to_excel(tmp_path / "Data_inputs_pen.xlsx", index=False)
+
+    inventories = load_inventories(str(tmp_path))
+
+    assert list(inventories) == ["pen"]
+    assert list(inventories["pen"]["Input/output"]) == ["Steel"]
+
+@pytest.mark.usefixtures("mock_bw")
+def test_portfolio_survives_products_without_any_match():
+    class SteelOnlyDB:
+        # Finds nothing for any other query, including refined and alternative terms
+        def search(self, query, limit=50, filter=None):
+            return MockDB().search(query) if "steel" in query else []
+
+    inventories = {
+        "pen": pd.DataFrame({"Input/output": ["Steel"], "In/out": [1.0], "Units": ["kg"]}),
+        "gadget": pd.DataFrame({"Input/output": ["Unobtainium"], "In/out": [1.0], "Units": ["kg"]}),
+    }
+
+    results = run_portfolio(inventories, SteelOnlyDB(), CountingClient(), METHODS)
+
+    assert list(results["pen"]["GWP"]) == [42]
+    # The unmatched row has no score, so the assessment drops it without failing the portfolio
+    assert results["gadget"].empty
+    assert "GWP" in results["gadget"].columns
@@ -0,0 +1,72 @@
+# test_retrieval_index.py
+
+import pytest
+import numpy as np
+import pandas as pd
+from ARIA.retrieval_index import ActivityRetrievalIndex
+from ARIA.search_workflow import process_dataframe
+
+@pytest.fixture
+def activities():
+    class MockActivity(dict):
+        def __init__(self, data, code):
+            super().__init__(data)
+            self.key = ("test-db", code)
+
+    return [
+        MockActivity({"name": "treatment of waste graphite", "location": "GLO", "unit": "kilogram",
+                      "reference product": "waste graphite"}, "a"),
+        MockActivity({"name": "graphite production", "location": "RoW", "unit": "kilogram",
+                      "reference product": "graphite"}, "b"),
+        MockActivity({"name": "market group for electricity, medium voltage", "location": "GLO",
+                      "unit": "kilowatt hour", "reference product": "electricity, medium voltage"}, "c"),
+    ]
+
+def test_search_ranks_and_filters(activities):
+    index = ActivityRetrievalIndex.build(activities)
+
+    results = index.search("*waste* *graphites*", limit=2)
+    assert [r["key"] for r in results] == [("test-db", "a"), ("test-db", "b")]
+    assert results[0]["score"] >= results[1]["score"]
+
+    results = index.search("graphite", filter={"location": "RoW"})
+    assert [r["name"] for r in results] == ["graphite production"]
+    assert index.search("zzzz") == []
+
+def test_exact_name_ranks_first_and_unrelated_queries_find_nothing(activities):
+    index = ActivityRetrievalIndex.build(activities + [
+        type(activities[0])({"name": "treatment of waste graphite, landfill", "location": "GLO",
+                             "unit": "kilogram", "reference product": "waste graphite"}, "d"),
+    ])
+
+    results = index.search("treatment of waste graphite")
+    assert [r["key"] for r in results[:2]] == [("test-db", "a"), ("test-db", "d")]
+    assert results[0]["score"] > results[1]["score"]
+    assert index.search("organic cotton fabric") == []
+
+def test_saved_index_is_memory_mapped(activities, tmp_path):
+    ActivityRetrievalIndex.build(activities).save(str(tmp_path))
+    index = ActivityRetrievalIndex.load(str(tmp_path))
+
+    assert isinstance(index.idf, np.memmap)
+    for array in (index.matrix.data, index.matrix.indices, index.matrix.indptr):
+        assert isinstance(array, np.memmap)
+    assert index.search("electricity medium voltage", limit=1)[0]["key"] == ("test-db", "c")
+
+def test_index_can_replace_database_search(activities):
+    class MockClient:
+        class chat:
+            class completions:
+                @staticmethod
+                def create(**kwargs):
+                    # The candidate list of the prompt must come from the index
+                    assert "treatment of waste graphite, GLO, kilogram" in kwargs["messages"][-1]["content"]
+                    return type("MockResponse", (object,), {
+                        "choices": [type("MockChoice", (object,), {
+                            "message": type("MockMessage", (object,), {"content": "ok"})
+                        })]
+                    })()
+
+    df = pd.DataFrame({"Input/output": ["Waste Graphite"]})
+    process_dataframe(df, ActivityRetrievalIndex.build(activities), MockClient())
+    assert df.loc[0, "Ecoinvent process"] == "ok"
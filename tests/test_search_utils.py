@@ -34,3 +34,108 @@ def test_get_alternative_search_terms(mock_client):
     suggestions = get_alternative_search_terms(mock_client, "waste graphite")
     assert len(suggestions) == 3
     assert suggestions == ["alternative one", "alternative two", "alternative three"]
+
+def test_search_locations_single_call_ranked_by_hierarchy():
+    from ARIA.search_utils import search_locations
+
+    class MockDB:
+        def __init__(self):
+            self.calls = []
+        def search(self, query, limit=50, filter=None):
+            self.calls.append((query, limit, filter))
+            return [
+                {"name": "steel production", "location": "GLO", "unit": "kg"},
+                {"name": "steel production", "location": "US", "unit": "kg"},
+                {"name": "steel production", "location": "RoW", "unit": "kg"},
+                {"name": "steel production", "location": "DE", "unit": "kg"},
+                {"name": "steel production", "location": "RoW", "unit": "kg"},
+            ]
+
+    db = MockDB()
+    results = search_locations(db, "*steel*", ["DE", "RoW", "GLO"])
+
+    assert db.calls == [("*steel*", 150, None)]
+    assert [r["location"] for r in results] == ["DE", "RoW", "GLO"]
+
+def test_rank_candidates_applies_selection_rules():
+    from ARIA.search_utils import rank_candidates
+
+    results = [
+        {"name": "treatment of waste graphite, landfill", "location": "GLO", "unit": "kg"},
+        {"name": "market for steel, low-alloyed", "location": "GLO", "unit": "kg"},
+        {"name": "steel production, low-alloyed", "location": "RoW", "unit": "kg"},
+        {"name": "electricity production, hard coal", "location": "GLO", "unit": "kWh"},
+    ]
+    ranked = rank_candidates("steel production", results)
+    assert [r["name"] for r in ranked] == ["steel production, low-alloyed", "market for steel, low-alloyed"]
+
+    ranked = rank_candidates("waste graphite", results)
+    assert ranked[0]["name"] == "treatment of waste graphite, landfill"
+    assert all("production" not in r["name"] for r in ranked)
+
+    # Rules that would leave nothing are not applied
+    assert len(rank_candidates("steel production", results[:1])) == 1
+
+def test_search_locations_tops_up_locations_crowded_out():
+    from ARIA.search_utils import search_locations
+
+    class CrowdedDB:
+        def __init__(self):
+            self.calls = []
+        def search(self, query, limit=50, filter=None):
+            self.calls.append(filter)
+            # Other locations rank first and fill the unfiltered search's limit
+            activities = [{"name": f"steel {i}", "location": "CH", "unit": "kg"} for i in range(20)]
+            activities += [{"name": f"steel {i}", "location": "GLO", "unit": "kg"} for i in range(3)]
+            activities += [{"name": f"steel {i}", "location": "RoW", "unit": "kg"} for i in range(3)]
+            if filter:
+                activities = [a for a in activities if a["location"] == filter["location"]]
+            return activities[:limit]
+
+    db = CrowdedDB()
+    results = search_locations(db, "*steel*", ["GLO", "RoW"], limit=5)
+
+    assert [r["location"] for r in results] == ["GLO"] * 3 + ["RoW"] * 3
+    assert db.calls == [None, {"location": "GLO"}, {"location": "RoW"}]
+
+@pytest.mark.parametrize("activity, candidate", [
+    ("transport, freight, lorry 16-32 metric ton, EURO5", "transport, freight, lorry 16-32 metric ton, EURO6"),
+    ("transport, freight, lorry 16-32 metric ton, EURO5", "transport, freight, lorry >32 metric ton, EURO5"),
+    ("nylon 6", "nylon 6-6"),
+])
+def test_look_alike_datasets_are_not_near_exact(activity, candidate):
+    from ARIA.search_utils import match_confidence, best_match
+
+    assert match_confidence(activity, candidate) <= 0.9
+    assert best_match(activity, [{"name": candidate}])[1] < 0.95
+
+def test_same_tokens_in_any_order_are_exact():
+    from ARIA.search_utils import match_confidence
+
+    assert match_confidence("Electricity, Medium Voltage, market for", "market for electricity, medium voltage") == 1.0
+    assert match_confidence("lorry 16-32 metric ton", "lorry 16-32 metric ton") == 1.0
+
+def test_search_locations_groups_by_location_in_one_query():
+    from ARIA.search_utils import search_locations, MemoizedSearch
+
+    class FacetedDB:
+        # Answers like Brightway's Whoosh searcher: raw documents grouped by lowercased location
+        def __init__(self):
+            self.calls, self.loaded = [], []
+        def search(self, query, limit=25, filter=None, facet=None, proxy=True):
+            self.calls.append((facet, proxy))
+            return {
+                "ch": [{"database": "db", "code": f"ch{i}"} for i in range(100)],
+                "glo": [{"database": "db", "code": f"glo{i}"} for i in range(8)],
+                "row": [{"database": "db", "code": "row0"}],
+            }
+        def get(self, code):
+            self.loaded.append(code)
+            return {"name": "steel", "location": code.rstrip("0123456789"), "unit": "kg", "code": code}
+
+    db = FacetedDB()
+    results = search_locations(MemoizedSearch(db), "*steel*", ["RoW", "GLO"], limit=5)
+
+    assert [r["code"] for r in results] == ["row0", "glo0", "glo1", "glo2", "glo3", "glo4"]
+    assert db.calls == [("location", False)]
+    assert db.loaded == ["row0", "glo0", "glo1", "glo2", "glo3", "glo4"]
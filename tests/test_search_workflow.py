@@ -46,3 +46,403 @@ def test_process_dataframe(dummy_db, mock_client):
     # We expect the first row might find "waste something" in mock DB, second row no match
     # Check if function sets 'Ecoinvent process' or a new column for the recommended dataset
     assert "Ecoinvent process" in result_df.columns, "Should populate 'Ecoinvent process' column"
+
+def test_process_dataframe_concurrent_keeps_row_order(dummy_db):
+    import threading
+    import time
+
+    class EchoCompletions:
+        def __init__(self):
+            self.active = 0
+            self.peak = 0
+            self.lock = threading.Lock()
+        def create(self, **kwargs):
+            with self.lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(0.02)
+            with self.lock:
+                self.active -= 1
+            # Echo the activity name back so each answer identifies its row
+            prompt = kwargs["messages"][-1]["content"]
+            activity = prompt.split("used for '")[1].split("'")[0]
+            return type("MockResponse", (object,), {
+                "choices": [
+                    type("MockChoice", (object,), {
+                        "message": type("MockMessage", (object,), {"content": activity})
+                    })
+                ]
+            })()
+
+    class EchoClient:
+        def __init__(self):
+            self.chat = type("MockChat", (object,), {})()
+            self.chat.completions = EchoCompletions()
+
+    client = EchoClient()
+    names = [f"waste item {i}" for i in range(8)]
+    df = pd.DataFrame({"Input/output": names})
+    result_df = process_dataframe(df, dummy_db, client, max_workers=4)
+
+    assert list(result_df["Ecoinvent process"]) == names
+    assert client.chat.completions.peak > 1
+
+def test_process_dataframe_batch_selection(dummy_db):
+    import json
+
+    class BatchCompletions:
+        def __init__(self):
+            self.prompts = []
+        def create(self, **kwargs):
+            prompt = kwargs["messages"][-1]["content"]
+            self.prompts.append(prompt)
+            if "Row 1:" in prompt:
+                # Answer rows 1 and 2 only; row 3 must fall back to a single-row request
+                content = "```json\n" + json.dumps({"1": "waste something, GLO, kg", "2": "other, RoW, kg"}) + "\n```"
+            else:
+                content = "fallback dataset, GLO, kg"
+            return type("MockResponse", (object,), {
+                "choices": [
+                    type("MockChoice", (object,), {
+                        "message": type("MockMessage", (object,), {"content": content})
+                    })
+                ]
+            })()
+
+    class BatchClient:
+        def __init__(self):
+            self.chat = type("MockChat", (object,), {})()
+            self.chat.completions = BatchCompletions()
+
+    client = BatchClient()
+    df = pd.DataFrame({"Input/output": ["waste a", "waste b", "waste c"]})
+    result_df = process_dataframe(df, dummy_db, client, batch_size=3)
+
+    assert list(result_df["Ecoinvent process"]) == [
+        "waste something, GLO, kg", "other, RoW, kg", "fallback dataset, GLO, kg"
+    ]
+    batch_prompts = [p for p in client.chat.completions.prompts if "Row 1:" in p]
+    assert len(batch_prompts) == 1
+    assert "Row 3: 'waste c'" in batch_prompts[0]
+
+def test_process_dataframe_memoizes_searches(mock_client):
+    from ARIA.search_utils import MemoizedSearch
+
+    class CountingDB:
+        def __init__(self):
+            self.calls = 0
+        def search(self, query, limit=50, filter=None):
+            self.calls += 1
+            return [{"name": "steel production", "location": "GLO", "unit": "kg"}]
+
+    db = CountingDB()
+    memo = MemoizedSearch(db)
+    df = pd.DataFrame({"Input/output": ["Steel", "steel ", "STEEL", "copper"]})
+    process_dataframe(df, db, mock_client, search_memo=memo)
+
+    assert db.calls == 2
+    # Duplicate rows share one match, so they do not even reach the memo
+    assert memo.stats() == {"hits": 0, "misses": 2, "entries": 2}
+
+def test_iter_process_dataframe_streams_records(dummy_db, mock_client):
+    from ARIA.search_workflow import iter_process_dataframe
+
+    df = pd.DataFrame({"Input/output": ["Waste Graphite", "No match"], "In/out": [1.0, 2.0]})
+    records = iter_process_dataframe(df, dummy_db, mock_client)
+
+    first = next(records)
+    assert first["index"] == 0
+    assert first["selection"] == "dummy dataset name"
+    assert "waste something, GLO, kg" in first["candidates"]
+    assert first["row"]["In/out"] == 1.0
+    second = next(records)
+    assert second["alternative_terms"] == ["dummy dataset name"]
+    assert "Ecoinvent process" not in df.columns
+
+def test_prompt_only_lists_top_k_candidates():
+    from ARIA.search_workflow import process_dataframe
+
+    class ManyDB:
+        def search(self, query, limit=50, filter=None):
+            return [{"name": f"steel production, variant {i}", "location": "GLO", "unit": "kg"} for i in range(30)] + [
+                {"name": "treatment of waste steel", "location": "GLO", "unit": "kg"}
+            ]
+
+    prompts = []
+    class RecordingClient:
+        def __init__(self):
+            self.chat = type("MockChat", (object,), {})()
+            self.chat.completions = self
+        def create(self, **kwargs):
+            prompts.append(kwargs["messages"][-1]["content"])
+            return type("MockResponse", (object,), {
+                "choices": [type("MockChoice", (object,), {
+                    "message": type("MockMessage", (object,), {"content": "steel production, variant 0, GLO, kg"})
+                })]
+            })()
+
+    df = pd.DataFrame({"Input/output": ["steel production"]})
+    process_dataframe(df, ManyDB(), RecordingClient(), top_k=5)
+
+    assert prompts[0].count("steel production, variant") == 5
+    assert "treatment of waste steel" not in prompts[0]
+
+def test_exact_matches_skip_the_llm():
+    from ARIA.search_workflow import iter_process_dataframe
+
+    class ElectricityDB:
+        def search(self, query, limit=50, filter=None):
+            return [
+                {"name": "market for electricity, low voltage", "location": "GLO", "unit": "kWh"},
+                {"name": "market for electricity, medium voltage", "location": "GLO", "unit": "kWh"},
+            ]
+
+    class CountingClient:
+        def __init__(self):
+            self.calls = 0
+            self.chat = type("MockChat", (object,), {})()
+            self.chat.completions = self
+        def create(self, **kwargs):
+            self.calls += 1
+            return type("MockResponse", (object,), {
+                "choices": [type("MockChoice", (object,), {
+                    "message": type("MockMessage", (object,), {"content": "market for electricity, low voltage, GLO, kWh"})
+                })]
+            })()
+
+    df = pd.DataFrame({"Input/output": ["Market for electricity, medium voltage", "power from the grid"]})
+    client = CountingClient()
+    records = sorted(iter_process_dataframe(df, ElectricityDB(), client), key=lambda record: record["index"])
+
+    assert records[0]["selection"] == "market for electricity, medium voltage, GLO, kWh"
+    assert records[0]["path"] == "fast_path"
+    assert records[1]["path"] == "llm"
+    assert client.calls == 1
+    # process_dataframe keeps the path for auditing
+    result_df = process_dataframe(df.copy(), ElectricityDB(), CountingClient())
+    assert list(result_df["Match path"]) == ["fast_path", "llm"]
+
+    client = CountingClient()
+    list(iter_process_dataframe(df, ElectricityDB(), client, fast_path_threshold=None))
+    assert client.calls == 2
+
+@pytest.mark.parametrize("options", [{"max_workers": 4}, {"batch_size": 2}])
+def test_duplicate_rows_share_one_match(options):
+    from ARIA.coalescing import MatchCoalescer
+    import threading
+    import time
+
+    class SlowClient:
+        # Answers slowly, so concurrent duplicates overlap
+        def __init__(self):
+            self.calls = 0
+            self._lock = threading.Lock()
+            self.chat = type("MockChat", (object,), {})()
+            self.chat.completions = self
+        def create(self, **kwargs):
+            with self._lock:
+                self.calls += 1
+            time.sleep(0.05)
+            content = kwargs["messages"][-1]["content"]
+            answer = '{"1": "steel production, GLO, kg", "2": "steel production, GLO, kg"}' if "Row 1:" in content else "steel production, GLO, kg"
+            return type("MockResponse", (object,), {
+                "choices": [type("MockChoice", (object,), {
+                    "message": type("MockMessage", (object,), {"content": answer})
+                })]
+            })()
+
+    class CountingDB:
+        def __init__(self):
+            self.calls = 0
+        def search(self, query, limit=50, filter=None):
+            self.calls += 1
+            return [{"name": "steel production", "location": "GLO", "unit": "kg"}]
+
+    df = pd.DataFrame({"Input/output": ["Steel", "steel ", "STEEL", "copper", "Copper"], "In/out": [1, 2, 3, 4, 5]})
+    client, db, coalescer = SlowClient(), CountingDB(), MatchCoalescer()
+    result_df = process_dataframe(df, db, client, coalescer=coalescer, **options)
+
+    assert list(result_df["Ecoinvent process"]) == ["steel production, GLO, kg"] * 5
+    assert db.calls == 2
+    assert coalescer.stats()["executions"] == 2
+    assert coalescer.stats()["shared"] == 3
+
+    # A later run with the same coalescer makes no new requests
+    calls = client.calls
+    process_dataframe(df.copy(), db, client, coalescer=coalescer, **options)
+    assert client.calls == calls
+
+def test_speculative_fallback_matches_sequential_priority():
+    from ARIA.search_workflow import iter_process_dataframe
+    import time
+
+    class SlowClient:
+        # Records when each request for 'graphite' starts and ends
+        def __init__(self):
+            self.chat = type("MockChat", (object,), {})()
+            self.chat.completions = self
+            self.spans = {}
+        def create(self, **kwargs):
+            content = kwargs["messages"][-1]["content"]
+            if "refined search term" in content:
+                kind, answer = "refine", "refined copper" if "copper" in content else "refined nothing"
+            elif "alternative search terms" in content:
+                kind, answer = "alternatives", "alt one, alt two, alt three"
+            else:
+                kind, answer = "select", "selected"
+            start = time.monotonic()
+            time.sleep(0.05)
+            if "graphite" in content:
+                self.spans[kind] = (start, time.monotonic())
+            return type("MockResponse", (object,), {
+                "choices": [type("MockChoice", (object,), {
+                    "message": type("MockMessage", (object,), {"content": answer})
+                })]
+            })()
+
+    class FallbackDB:
+        # Only refined copper and the last two alternative terms find anything
+        def search(self, query, limit=50, filter=None):
+            for term in ("*refined* *copper*", "*alt* *two*", "*alt* *three*"):
+                if query == term:
+                    return [{"name": f"{term} dataset", "location": "GLO", "unit": "kg"}]
+            return []
+
+    df = pd.DataFrame({"Input/output": ["copper", "graphite"], "Notes": ["use copper", "use graphite"]})
+    runs = {}
+    for speculative in (False, True):
+        client = SlowClient()
+        records = sorted(
+            iter_process_dataframe(df, FallbackDB(), client, speculative=speculative),
+            key=lambda record: record["index"],
+        )
+        runs[speculative] = ([record["candidates"] for record in records], client.spans)
+
+    assert runs[True][0] == runs[False][0]
+    assert "*refined* *copper* dataset" in runs[True][0][0]
+    assert "*alt* *two* dataset" in runs[True][0][1]
+    # 'graphite' asks for its refined and alternative terms at the same time, not one after the other
+    sequential, speculative = runs[False][1], runs[True][1]
+    assert sequential["alternatives"][0] >= sequential["refine"][1]
+    assert speculative["alternatives"][0] < speculative["refine"][1]
+    assert speculative["refine"][0] < speculative["alternatives"][1]
+
+@pytest.mark.parametrize("speculative", [False, True])
+def test_refined_hit_survives_failed_alternatives(speculative):
+    from ARIA.instrumentation import MetricsCollector
+
+    class RateLimited(Exception):
+        status_code = 429
+
+    class LimitedClient:
+        def __init__(self):
+            self.chat = type("MockChat", (object,), {})()
+            self.chat.completions = self
+        def create(self, **kwargs):
+            content = kwargs["messages"][-1]["content"]
+            if "alternative search terms" in content:
+                raise RateLimited()
+            answer = "refined copper" if "refined search term" in content else "1"
+            return type("MockResponse", (object,), {
+                "choices": [type("MockChoice", (object,), {
+                    "message": type("MockMessage", (object,), {"content": answer})
+                })]
+            })()
+
+    class RefinedDB:
+        def search(self, query, limit=50, filter=None):
+            if query == "*refined* *copper*":
+                return [{"name": "copper production", "location": "GLO", "unit": "kg", "key": ("db", "c")}]
+            return []
+
+    df = pd.DataFrame({"Input/output": ["wire"], "Notes": ["use copper"]})
+    metrics = MetricsCollector()
+    result_df = process_dataframe(df, RefinedDB(), LimitedClient(), speculative=speculative, metrics=metrics)
+
+    assert result_df.loc[0, "Activity key"] == ("db", "c")
+    # The refinement on the fallback thread counts towards the row, like the selection
+    rows = metrics.summary().set_index("stage")
+    assert rows.loc["row", "chat_calls"] == 2
+
+def test_speculative_rows_share_one_executor(monkeypatch, mock_client):
+    from concurrent.futures import ThreadPoolExecutor
+    from ARIA import search_workflow
+
+    executors = []
+    class RecordingExecutor(ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            executors.append(self)
+    monkeypatch.setattr(search_workflow, "ThreadPoolExecutor", RecordingExecutor)
+
+    class EmptyDB:
+        def search(self, query, limit=50, filter=None):
+            return []
+
+    df = pd.DataFrame({"Input/output": ["graphite", "copper", "nickel"], "Notes": ["a", "b", "c"]})
+    process_dataframe(df, EmptyDB(), mock_client, speculative=True)
+
+    assert len(executors) == 1
+    assert executors[0]._shutdown
+
+def test_numbered_selection_resolves_to_activity_key():
+    from ARIA.search_workflow import _resolve_selection
+
+    class KeyedDB:
+        def search(self, query, limit=50, filter=None):
+            return [
+                {"name": "market for copper", "location": "GLO", "unit": "kg", "key": ("db", "a")},
+                {"name": "copper production, primary", "location": "GLO", "unit": "kg", "key": ("db", "b")},
+            ]
+
+    prompts = []
+    class NumberClient:
+        def __init__(self):
+            self.chat = type("MockChat", (object,), {})()
+            self.chat.completions = self
+        def create(self, **kwargs):
+            prompts.append(kwargs["messages"][-1]["content"])
+            answer = '{"1": 2}' if "Row 1:" in prompts[-1] else "2"
+            return type("MockResponse", (object,), {
+                "choices": [type("MockChoice", (object,), {
+                    "message": type("MockMessage", (object,), {"content": answer})
+                })]
+            })()
+
+    for options in ({}, {"batch_size": 5}):
+        df = pd.DataFrame({"Input/output": ["copper market"]})
+        result_df = process_dataframe(df, KeyedDB(), NumberClient(), **options)
+        assert result_df.loc[0, "Ecoinvent process"] == "copper production, primary, GLO, kg"
+        assert result_df.loc[0, "Activity key"] == ("db", "b")
+    assert "2. copper production, primary, GLO, kg" in prompts[0]
+
+    candidates = KeyedDB().search("")
+    assert _resolve_selection("1. market for copper, GLO, kg", candidates) == ("market for copper, GLO, kg", ("db", "a"))
+    assert _resolve_selection("- Market for copper, GLO, kg", candidates)[1] == ("db", "a")
+    assert _resolve_selection("7", candidates) == ("7", None)
+
+def test_selection_accepts_decorated_numbers_and_skips_empty_candidates():
+    from ARIA.search_workflow import _resolve_selection, _select_dataset, _select_dataset_batch
+
+    candidates = [
+        {"name": "market for copper", "location": "GLO", "unit": "kg", "key": ("db", "a")},
+        {"name": "2-propanol production", "location": "GLO", "unit": "kg", "key": ("db", "b")},
+    ]
+    for answer in ["2", "2.", "2)", "**2**", "Candidate 2", "#2", "2. 2-propanol production, GLO, kg"]:
+        assert _resolve_selection(answer, candidates)[1] == ("db", "b"), answer
+    assert _resolve_selection("2-propanol production, GLO, kg", candidates)[1] == ("db", "b")
+    assert _resolve_selection("1: market for copper", candidates)[1] == ("db", "a")
+    assert _resolve_selection("none of them", candidates) == ("none of them", None)
+    # A name starting with a number is not a candidate number
+    for answer in ["1-propanol production, RER, kilogram", "2 kg of copper", "1. 1-propanol production, RER, kg"]:
+        assert _resolve_selection(answer, candidates) == (answer, None), answer
+
+    class FailingClient:
+        def __init__(self):
+            self.chat = type("MockChat", (object,), {})()
+            self.chat.completions = self
+        def create(self, **kwargs):
+            raise AssertionError("no request expected without candidates")
+
+    assert _select_dataset(FailingClient(), "unobtainium", [], "", False) == ("", None)
+    assert _select_dataset_batch(FailingClient(), [("unobtainium", []), ("kryptonite", [])], "", False) == [("", None)] * 2